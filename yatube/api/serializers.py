@@ -0,0 +1,86 @@
+"""Сериализация моделей в словари для JSON без шаблонизатора.
+
+Каждое поле API описано путями модели, которые нужно загрузить, и
+функцией, достающей значение; по запрошенным полям строятся only()
+и select_related().
+"""
+
+
+def _slug(group):
+    return group.slug if group is not None else None
+
+
+def _counter(field):
+    """Счётчик пользователя или ноль, если строки счётчиков нет.
+
+    Её нет, например, у пользователей, созданных через bulk_create.
+    """
+    return lambda user: getattr(getattr(user, 'counters', None), field, 0)
+
+
+POST_FIELDS = {
+    'id': (('id',), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': (('pub_date',), lambda post: post.pub_date),
+    'updated_at': (('updated_at',), lambda post: post.updated_at),
+    'author': (('author__username',), lambda post: post.author.username),
+    'group': (('group__slug',), lambda post: _slug(post.group)),
+    'image': (('image',),
+              lambda post: post.image.url if post.image else None),
+    'comments_count': (('comments_count',),
+                       lambda post: post.comments_count),
+}
+
+COMMENT_FIELDS = {
+    'id': (('id',), lambda comment: comment.pk),
+    'post': (('post',), lambda comment: comment.post_id),
+    'author': (('author__username',),
+               lambda comment: comment.author.username),
+    'text': (('text',), lambda comment: comment.text),
+    'created': (('created',), lambda comment: comment.created),
+}
+
+GROUP_FIELDS = {
+    'id': (('id',), lambda group: group.pk),
+    'slug': (('slug',), lambda group: group.slug),
+    'title': (('title',), lambda group: group.title),
+    'description': (('description',), lambda group: group.description),
+}
+
+USER_FIELDS = {
+    'username': (('username',), lambda user: user.username),
+    'full_name': (('first_name', 'last_name'),
+                  lambda user: user.get_full_name()),
+    'posts_count': (('counters__posts_count',),
+                    _counter('posts_count')),
+    'followers_count': (('counters__followers_count',),
+                        _counter('followers_count')),
+    'following_count': (('counters__following_count',),
+                        _counter('following_count')),
+}
+
+
+def sparse(queryset, spec, fields, required=()):
+    """Queryset, загружающий только нужные для полей колонки.
+
+    Связанные модели подтягиваются select_related, только если их поля
+    запрошены; required — поля, нужные помимо ответа, например курсору.
+    """
+    only = set(required)
+    related = set()
+    for name in fields:
+        for path in spec[name][0]:
+            only.add(path)
+            if '__' in path:
+                relation = path.rsplit('__', 1)[0]
+                related.add(relation)
+                if queryset.model._meta.get_field(relation).concrete:
+                    # Внешний ключ нельзя отложить, если по нему идёт join.
+                    only.add(relation)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only)
+
+
+def serialize(obj, spec, fields):
+    return {name: spec[name][1](obj) for name in fields}
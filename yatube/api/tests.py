@@ -0,0 +1,131 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='ApiAuthor', first_name='Анна', last_name='Апи')
+        cls.group = Group.objects.create(
+            title='Группа API', slug='api', description='Описание')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {num}',
+                group=cls.group if num % 2 else None)
+            for num in range(5)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.author, text='Комментарий')
+
+    def setUp(self):
+        self.client = Client()
+
+    def get_json(self, url, data=None, status=200):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        content = (b''.join(response.streaming_content)
+                   if response.streaming else response.content)
+        return json.loads(content)
+
+    def test_post_list_is_paginated_by_cursor(self):
+        """Посты отдаются от новых к старым, страницы связаны курсорами."""
+        url = reverse('api:post_list')
+        first = self.get_json(url, {'limit': 3})
+        self.assertEqual(
+            [post['text'] for post in first['results']],
+            ['Пост 4', 'Пост 3', 'Пост 2'])
+        self.assertIsNone(first['previous'])
+        second = self.get_json(first['next'])
+        self.assertEqual(
+            [post['text'] for post in second['results']],
+            ['Пост 1', 'Пост 0'])
+        self.assertIsNone(second['next'])
+        back = self.get_json(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+
+    def test_post_list_streams(self):
+        """Список постов отдаётся потоком."""
+        response = self.client.get(reverse('api:post_list'))
+        self.assertTrue(response.streaming)
+
+    def test_post_fields(self):
+        """Пост содержит автора, группу и число комментариев."""
+        post = self.get_json(
+            reverse('api:post_detail', args=(self.posts[1].pk,)))
+        self.assertEqual(post['author'], self.author.username)
+        self.assertEqual(post['group'], self.group.slug)
+        self.assertIsNone(post['image'])
+        self.assertEqual(post['comments_count'], 0)
+
+    def test_sparse_fields_load_only_needed_columns(self):
+        """?fields= ограничивает и ответ, и колонки в запросе."""
+        url = reverse('api:post_list')
+        with self.assertNumQueries(1):
+            data = self.get_json(url, {'fields': 'id,author'})
+        self.assertEqual(set(data['results'][0]), {'id', 'author'})
+        data = self.get_json(url, {'fields': 'text'})
+        self.assertEqual(set(data['results'][0]), {'text'})
+
+    def test_empty_fields_mean_all_fields(self):
+        """?fields= без имён отдаёт все поля, а не пустые объекты."""
+        url = reverse('api:post_list')
+        full = self.get_json(url)['results'][0]
+        for raw in (',', ' ', ' , '):
+            with self.subTest(fields=raw):
+                data = self.get_json(url, {'fields': raw})
+                self.assertEqual(data['results'][0], full)
+
+    def test_filters(self):
+        """Посты фильтруются по группе и автору."""
+        url = reverse('api:post_list')
+        data = self.get_json(url, {'group': self.group.slug})
+        self.assertEqual(len(data['results']), 2)
+        data = self.get_json(url, {'author': 'nobody'})
+        self.assertEqual(data['results'], [])
+
+    def test_comments_groups_and_users(self):
+        """Комментарии, группы и профили доступны в API."""
+        comments = self.get_json(
+            reverse('api:comment_list', args=(self.posts[0].pk,)))
+        self.assertEqual(comments['results'][0]['text'], self.comment.text)
+        groups = self.get_json(reverse('api:group_list'))
+        self.assertEqual(groups['results'][0]['slug'], self.group.slug)
+        group = self.get_json(
+            reverse('api:group_detail', args=(self.group.slug,)))
+        self.assertEqual(group['title'], self.group.title)
+        user = self.get_json(
+            reverse('api:user_detail', args=(self.author.username,)))
+        self.assertEqual(user['full_name'], 'Анна Апи')
+        self.assertEqual(user['posts_count'], 5)
+
+    def test_user_without_counters(self):
+        """Пользователь без строки счётчиков отдаётся с нулями."""
+        User.objects.bulk_create([User(username='Bulk')])
+        self.assertFalse(
+            UserCounters.objects.filter(user__username='Bulk').exists())
+        user = self.get_json(reverse('api:user_detail', args=('Bulk',)))
+        self.assertEqual(
+            [user['posts_count'], user['followers_count'],
+             user['following_count']], [0, 0, 0])
+
+    def test_errors_are_json(self):
+        """Ошибки отдаются в JSON с нужным кодом."""
+        self.get_json(reverse('api:post_detail', args=(0,)), status=404)
+        self.get_json(reverse('api:post_list'), {'fields': 'secret'},
+                      status=400)
+        self.get_json(reverse('api:post_list'), {'limit': 0}, status=400)
+
+    def test_read_only(self):
+        """API только для чтения."""
+        response = self.client.post(reverse('api:post_list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,156 @@
+import json
+from functools import wraps
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_GET
+
+from posts.models import Comment, Group, Post, User
+from posts.pagination import (COMMENT_ORDERING, POST_ORDERING,
+                              get_cursor_page)
+
+from .serializers import (COMMENT_FIELDS, GROUP_FIELDS, POST_FIELDS,
+                          USER_FIELDS, serialize, sparse)
+
+DEFAULT_LIMIT = 20
+
+MAX_LIMIT = 100
+
+GROUP_ORDERING = ('id',)
+
+
+class BadRequest(Exception):
+    """Ошибка в параметрах запроса, отдаётся клиенту с кодом 400."""
+
+
+def _dumps(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _error(message, status):
+    return JsonResponse({'detail': message}, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def api_view(view):
+    """Только GET; ошибки отдаются в JSON, а не HTML-страницей."""
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return _error('Не найдено.', 404)
+        except BadRequest as error:
+            return _error(str(error), 400)
+    return wrapper
+
+
+def get_fields(request, spec):
+    """Поля из ?fields=a,b; без параметра или без имён в нём — все поля."""
+    raw = request.GET.get('fields', '')
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    if not fields:
+        return list(spec)
+    unknown = [name for name in fields if name not in spec]
+    if unknown:
+        raise BadRequest(f'Неизвестные поля: {", ".join(unknown)}.')
+    return fields
+
+
+def get_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise BadRequest('limit должен быть числом.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise BadRequest(f'limit должен быть от 1 до {MAX_LIMIT}.')
+    return limit
+
+
+def _page_url(request, param, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    for name in ('after', 'before'):
+        query.pop(name, None)
+    query[param] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def stream_list(request, queryset, spec, ordering):
+    """Страница списка по курсору, отдаваемая потоком по объекту.
+
+    Сама страница (не больше MAX_LIMIT объектов) выбирается из базы
+    целиком до начала ответа: курсоры соседних страниц известны только
+    после выборки. Потоком идёт сериализация: объекты превращаются
+    в JSON по мере отправки, и ответ не собирается в памяти одной
+    строкой.
+    """
+    fields = get_fields(request, spec)
+    page = get_cursor_page(
+        request, sparse(queryset, spec, fields, required=ordering),
+        ordering, per_page=get_limit(request),
+    )
+    next_url = _page_url(request, 'after', page.next_cursor)
+    previous_url = _page_url(request, 'before', page.previous_cursor)
+
+    def chunks():
+        yield '{"results": ['
+        for number, obj in enumerate(page):
+            yield (',' if number else '') + _dumps(
+                serialize(obj, spec, fields))
+        yield (f'], "next": {_dumps(next_url)}, '
+               f'"previous": {_dumps(previous_url)}}}')
+
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+def detail(request, queryset, spec, **lookup):
+    fields = get_fields(request, spec)
+    obj = get_object_or_404(sparse(queryset, spec, fields), **lookup)
+    return JsonResponse(serialize(obj, spec, fields),
+                        json_dumps_params={'ensure_ascii': False})
+
+
+@api_view
+def post_list(request):
+    posts = Post.objects.all()
+    group = request.GET.get('group')
+    if group:
+        posts = posts.filter(group__slug=group)
+    author = request.GET.get('author')
+    if author:
+        posts = posts.filter(author__username=author)
+    return stream_list(request, posts, POST_FIELDS, POST_ORDERING)
+
+
+@api_view
+def post_detail(request, post_id):
+    return detail(request, Post.objects.all(), POST_FIELDS, pk=post_id)
+
+
+@api_view
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return stream_list(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        COMMENT_ORDERING)
+
+
+@api_view
+def group_list(request):
+    return stream_list(
+        request, Group.objects.all(), GROUP_FIELDS, GROUP_ORDERING)
+
+
+@api_view
+def group_detail(request, slug):
+    return detail(request, Group.objects.all(), GROUP_FIELDS, slug=slug)
+
+
+@api_view
+def user_detail(request, username):
+    return detail(request, User.objects.all(), USER_FIELDS,
+                  username=username)
@@ -0,0 +1,104 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache.backends import locmem
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as django_backend
+
+from . import metrics
+
+CACHE_KINDS = (
+    ('template.cache.', 'fragment'),
+    ('post_card:', 'card'),
+    ('page:', 'page'),
+    ('generation:', 'generation'),
+    ('journal:', 'journal'),
+    ('syndication:', 'syndication'),
+    ('timeline:', 'timeline'),
+)
+
+SORL_PREFIX = 'sorl-thumbnail'
+
+_MISSING = object()
+
+_local = threading.local()
+
+
+def cache_kind(key):
+    """Вид ключа кэша по префиксу: фрагмент, страница, sorl и т. д."""
+    if key.startswith(getattr(settings, 'THUMBNAIL_KEY_PREFIX', SORL_PREFIX)):
+        return 'sorl'
+    for prefix, kind in CACHE_KINDS:
+        if key.startswith(prefix):
+            return kind
+    return 'other'
+
+
+def _record(keys, found):
+    if getattr(_local, 'muted', False):
+        return
+    lookups = Counter((cache_kind(key), key in found) for key in keys)
+    for (kind, hit), count in lookups.items():
+        metrics.inc(metrics.CACHE_REQUESTS, count, kind=kind,
+                    result='hit' if hit else 'miss')
+
+
+@contextmanager
+def _muted():
+    """get_many многих бэкендов читает через get: не считаем дважды."""
+    _local.muted = True
+    try:
+        yield
+    finally:
+        _local.muted = False
+
+
+class CacheMetricsMixin:
+    """Считает попадания и промахи get и get_many по видам ключей."""
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        hit = value is not _MISSING
+        _record([key], {key} if hit else ())
+        return value if hit else default
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with _muted():
+            found = super().get_many(keys, version)
+        _record(keys, found)
+        return found
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    pass
+
+
+class Template(django_backend.Template):
+    def render(self, context=None, request=None):
+        started = perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.observe(
+                metrics.TEMPLATE_SECONDS, perf_counter() - started,
+                template=self.origin.template_name or 'string')
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """Шаблоны Django с замером времени рендеринга корневых шаблонов.
+
+    Вложенные include и карточки постов входят во время родителя.
+    """
+
+    def from_string(self, template_code):
+        return Template(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return Template(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            django_backend.reraise(exc, self)
@@ -0,0 +1,31 @@
+from collections import namedtuple
+
+from django.urls import URLPattern
+
+QueryBudget = namedtuple('QueryBudget', ('queries', 'ms'))
+
+DEFAULT_MS = 100
+
+
+def query_budget(queries, ms=DEFAULT_MS):
+    """Помечает вьюху предельным числом SQL-запросов и их временем.
+
+    Вьюха не оборачивается: бюджет проверяют тесты через
+    core.testing.QueryBudgetMixin, в рабочем коде он ничего не стоит.
+    """
+    def decorator(view):
+        view.query_budget = QueryBudget(queries, ms)
+        return view
+    return decorator
+
+
+def url_budgets(urlconf):
+    """Бюджеты вьюх модуля urls по именам маршрутов.
+
+    Маршруты из include() пропускаются; вьюха без бюджета даёт None.
+    """
+    return {
+        pattern.name: getattr(pattern.callback, 'query_budget', None)
+        for pattern in urlconf.urlpatterns
+        if isinstance(pattern, URLPattern) and pattern.name
+    }
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+CHECKPOINT_MODES = ('passive', 'full', 'restart', 'truncate')
+
+INCREMENTAL = 2
+
+
+class Command(BaseCommand):
+    help = ('Обслуживание базы SQLite: сброс WAL в основной файл, '
+            'ANALYZE и постепенная очистка свободных страниц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='База данных, по умолчанию default.')
+        parser.add_argument(
+            '--checkpoint', choices=CHECKPOINT_MODES, default='truncate',
+            help='Режим wal_checkpoint.')
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Сколько свободных страниц вернуть, 0 — все.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        with connection.cursor() as cursor:
+            self.checkpoint(cursor, options['checkpoint'])
+            cursor.execute('ANALYZE')
+            self.stdout.write('Статистика планировщика обновлена.')
+            self.vacuum(cursor, options['vacuum_pages'])
+        self.stdout.write(self.style.SUCCESS('Обслуживание завершено.'))
+
+    def checkpoint(self, cursor, mode):
+        cursor.execute(f'PRAGMA wal_checkpoint({mode.upper()})')
+        busy, log, written = cursor.fetchone()
+        if busy:
+            self.stderr.write(
+                'WAL занят читателями, перенесена только часть страниц.')
+        self.stdout.write(f'WAL: {written} из {log} страниц в основном файле.')
+
+    def vacuum(self, cursor, pages):
+        """Возвращает свободные страницы системе.
+
+        Пока база не переведена в auto_vacuum=INCREMENTAL, это делает
+        один полный VACUUM, после него хватает incremental_vacuum.
+        """
+        cursor.execute('PRAGMA auto_vacuum')
+        if cursor.fetchone()[0] != INCREMENTAL:
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            cursor.execute('VACUUM')
+            self.stdout.write('База переведена в auto_vacuum=INCREMENTAL.')
+            return
+        cursor.execute('PRAGMA freelist_count')
+        free = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA incremental_vacuum({pages})')
+        cursor.fetchall()
+        cursor.execute('PRAGMA freelist_count')
+        self.stdout.write(
+            f'Освобождено страниц: {free - cursor.fetchone()[0]}.')
@@ -0,0 +1,88 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from posts.caching import (INDEX_FEED, JOURNAL_KEY, bump_generation,
+                           follow_feed, group_feed, journal_position,
+                           journaled_feeds, profile_feed)
+from posts.models import Follow, Group, User
+
+BACKUP_PAGES = 1024
+
+
+def synced_key(alias):
+    return f'{JOURNAL_KEY}:synced:{alias}'
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в реплики для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'replicas', nargs='*',
+            help='Псевдонимы реплик, по умолчанию все из DATABASE_REPLICAS.')
+
+    def handle(self, *args, **options):
+        aliases = options['replicas'] or list(
+            getattr(settings, 'DATABASE_REPLICAS', ()))
+        if not aliases:
+            raise CommandError('Реплики не настроены.')
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('Команда работает только с SQLite.')
+        if source.in_atomic_block:
+            raise CommandError(
+                'Копия снимается вне транзакции: незафиксированная запись '
+                'в основной базе не даёт backup API завершиться.')
+        source.ensure_connection()
+        feeds = set()
+        for alias in aliases:
+            feeds |= self.sync(source.connection, alias)
+        bump_generation(*feeds, journal=False)
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплики обновлены, сброшено лент: {len(feeds)}.'))
+
+    def sync(self, source, alias):
+        """Онлайн-копия через backup API: чтения реплики не блокируются.
+
+        Копирование идёт порциями по BACKUP_PAGES страниц и начинается
+        заново, если основную базу изменили в процессе. Возвращает
+        ленты, сдвинутые с прошлой синхронизации реплики: их кэш мог
+        заполниться из отстававших данных. Они берутся из журнала
+        поколений, поэтому работа зависит от числа записей, а не от
+        размера базы. Записи, сделанные во время копии, сдвигаются
+        и в следующий раз: неизвестно, попали ли они в копию.
+        """
+        database = connections.databases.get(alias)
+        if database is None or alias == DEFAULT_DB_ALIAS:
+            raise CommandError(f'Неизвестная реплика: {alias}.')
+        synced = cache.get(synced_key(alias))
+        started = journal_position()
+        target = sqlite3.connect(database['NAME'])
+        try:
+            source.backup(target, pages=BACKUP_PAGES)
+        finally:
+            target.close()
+        self.stdout.write(f'{alias}: {database["NAME"]}')
+        feeds = None
+        if synced is not None:
+            feeds = journaled_feeds(synced, journal_position())
+        cache.set(synced_key(alias), started, None)
+        return self.all_feeds() if feeds is None else feeds
+
+    def all_feeds(self):
+        """Все ленты: для первой синхронизации или потерянного журнала."""
+        primary = DEFAULT_DB_ALIAS
+        return {
+            INDEX_FEED,
+            *(group_feed(pk) for pk in
+              Group.objects.using(primary).values_list('pk', flat=True)),
+            *(profile_feed(pk) for pk in
+              User.objects.using(primary).values_list('pk', flat=True)),
+            *(follow_feed(pk) for pk in
+              Follow.objects.using(primary).order_by()
+              .values_list('user_id', flat=True).distinct()),
+        }
@@ -0,0 +1,221 @@
+import atexit
+import json
+import logging
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+FLUSH_SECONDS = 1.0
+
+SUFFIX = '.json'
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = 'yatube_requests_total'
+REQUEST_SECONDS = 'yatube_request_duration_seconds'
+DB_QUERIES = 'yatube_db_queries_total'
+DB_SECONDS = 'yatube_db_query_seconds_total'
+TEMPLATE_SECONDS = 'yatube_template_render_seconds'
+CACHE_REQUESTS = 'yatube_cache_requests_total'
+CACHE_HIT_RATIO = 'yatube_cache_hit_ratio'
+
+METRICS = {
+    REQUESTS: ('counter', 'Ответы по вьюхам и кодам.'),
+    REQUEST_SECONDS: ('histogram', 'Время ответа по вьюхам.'),
+    DB_QUERIES: ('counter', 'Запросы к базе по вьюхам.'),
+    DB_SECONDS: ('counter', 'Время запросов к базе по вьюхам.'),
+    TEMPLATE_SECONDS: ('histogram', 'Время рендеринга шаблонов.'),
+    CACHE_REQUESTS: ('counter', 'Чтения из кэша по видам ключей.'),
+    CACHE_HIT_RATIO: (
+        'gauge', 'Доля попаданий в кэш по видам ключей с запуска.'),
+}
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_histograms = {}
+_last_flush = 0.0
+_process = (None, None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] += value
+
+
+def observe(name, value, **labels):
+    """Наблюдение гистограммы: счётчики корзин без накопления и сумма."""
+    key = _key(name, labels)
+    bucket = bisect_left(BUCKETS, value)
+    with _lock:
+        row = _histograms.get(key)
+        if row is None:
+            row = _histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+        row[bucket] += 1
+        row[-1] += value
+
+
+def reset():
+    """Обнуляет метрики процесса; для тестов."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            'counters': [
+                [name, labels, value]
+                for (name, labels), value in _counters.items()
+            ],
+            'histograms': [
+                [name, labels, list(row)]
+                for (name, labels), row in _histograms.items()
+            ],
+        }
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def process_name():
+    """Имя файла процесса: pid и случайная часть.
+
+    Одного pid мало: после перезапуска его может получить новый
+    процесс и затереть файл прежнего, и счётчики пойдут назад.
+    Имя выбирается заново после fork.
+    """
+    global _process
+    pid = os.getpid()
+    if _process[0] != pid:
+        _process = (pid, f'{pid}-{uuid4().hex[:12]}')
+    return _process[1]
+
+
+def flush(force=False):
+    """Пишет метрики процесса в METRICS_DIR/<процесс>.json.
+
+    Без force пишет не чаще раза в METRICS_FLUSH_SECONDS, чтобы запись
+    файла не попадала в каждый запрос. Файл подменяется атомарно,
+    поэтому читатели не видят его наполовину записанным. Ошибка
+    записи только попадает в лог: метрики не должны ронять запросы.
+    """
+    global _last_flush
+    directory = metrics_dir()
+    if not directory:
+        return
+    now = monotonic()
+    interval = getattr(settings, 'METRICS_FLUSH_SECONDS', FLUSH_SECONDS)
+    if not force and now - _last_flush < interval:
+        return
+    _last_flush = now
+    path = os.path.join(directory, f'{process_name()}{SUFFIX}')
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(temporary, 'w') as output:
+            json.dump(snapshot(), output)
+        os.replace(temporary, path)
+    except OSError:
+        logger.exception('Не удалось записать метрики в %s', path)
+
+
+atexit.register(flush, force=True)
+
+
+def _snapshots():
+    directory = metrics_dir()
+    if not directory:
+        yield snapshot()
+        return
+    flush(force=True)
+    for name in os.listdir(directory):
+        if not name.endswith(SUFFIX):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as stored:
+                yield json.load(stored)
+        except (OSError, ValueError):
+            continue
+
+
+def collect():
+    """Сумма метрик всех процессов: {имя: {метки: значение}}.
+
+    Файлы завершившихся процессов остаются, чтобы счётчики не шли
+    назад; каталог очищается при выкладке.
+    """
+    counters = defaultdict(lambda: defaultdict(float))
+    histograms = defaultdict(dict)
+    for data in _snapshots():
+        for name, labels, value in data['counters']:
+            counters[name][tuple(map(tuple, labels))] += value
+        for name, labels, row in data['histograms']:
+            merged = histograms[name].setdefault(
+                tuple(map(tuple, labels)), [0] * len(row))
+            for index, value in enumerate(row):
+                merged[index] += value
+    return counters, histograms
+
+
+def _hit_ratios(counters):
+    totals = defaultdict(lambda: [0, 0])
+    for labels, value in counters[CACHE_REQUESTS].items():
+        label = dict(labels)
+        totals[(('kind', label['kind']),)][label['result'] == 'hit'] += value
+    return {
+        labels: hits / (misses + hits)
+        for labels, (misses, hits) in totals.items()
+    }
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _sample(name, labels, value):
+    if labels:
+        name += '{%s}' % ','.join(
+            f'{label}="{_escape(text)}"' for label, text in labels)
+    return f'{name} {value!r}'
+
+
+def exposition():
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    counters, histograms = collect()
+    values = dict(counters)
+    values[CACHE_HIT_RATIO] = _hit_ratios(counters)
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind != 'histogram':
+            for labels, value in sorted(values.get(name, {}).items()):
+                lines.append(_sample(name, labels, float(value)))
+            continue
+        for labels, row in sorted(histograms.get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), row):
+                cumulative += count
+                lines.append(_sample(
+                    f'{name}_bucket', labels + (('le', str(bound)),),
+                    int(cumulative)))
+            lines.append(_sample(f'{name}_sum', labels, float(row[-1])))
+            lines.append(_sample(f'{name}_count', labels, int(cumulative)))
+    return '\n'.join(lines) + '\n'
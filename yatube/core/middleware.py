@@ -0,0 +1,232 @@
+import logging
+import random
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics, profiling
+from .routers import allow_replicas, has_written, replicas, reset_writes
+
+logger = logging.getLogger(__name__)
+
+PIN_COOKIE = 'primary_pin'
+
+PIN_SECONDS = 60
+
+PROFILE_PARAM = '_profile'
+
+UNRESOLVED = 'unresolved'
+
+
+def pin_key(user_id):
+    return f'primary-pin:{user_id}'
+
+
+def stream_through(content, around, finish):
+    """Тело потокового ответа для замеров, которым нужна его выдача.
+
+    Каждый кусок выдаётся внутри контекста around(), finish()
+    вызывается, когда поток кончился или был закрыт.
+    """
+    chunks = iter(content)
+    try:
+        while True:
+            with around():
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+            yield chunk
+    finally:
+        finish()
+
+
+@contextmanager
+def profiled(profiler):
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+class ReplicaPinMiddleware:
+    """Чтения из реплик с гарантией видеть свои записи.
+
+    Реплики включаются только для безопасных запросов незакреплённых
+    читателей, остальные читают из основной базы. Если запрос что-то
+    записал, читатель закрепляется на REPLICA_PIN_SECONDS, которых
+    должно хватать на отставание реплик: пользователь — по id в общем
+    кэше, поэтому и в других вкладках и на других устройствах, гость —
+    кукой. Стоит после аутентификации, чтобы знать пользователя.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        allow_replicas(
+            request.method in ('GET', 'HEAD', 'OPTIONS')
+            and not self.pinned(request)
+        )
+        reset_writes()
+        try:
+            response = self.get_response(request)
+            if has_written():
+                self.pin(request, response)
+            return response
+        finally:
+            allow_replicas(False)
+            reset_writes()
+
+    def pinned(self, request):
+        if PIN_COOKIE in request.COOKIES:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user and user.is_authenticated
+                    and cache.get(pin_key(user.pk)))
+
+    def pin(self, request, response):
+        """Закрепляет автора записи.
+
+        Пользователь берётся после вьюхи: вход меняет request.user.
+        """
+        seconds = getattr(settings, 'REPLICA_PIN_SECONDS', PIN_SECONDS)
+        user = getattr(request, 'user', None)
+        if user and user.is_authenticated:
+            cache.set(pin_key(user.pk), True, seconds)
+        response.set_cookie(PIN_COOKIE, '1', httponly=True, max_age=seconds)
+
+
+class ProfilingMiddleware:
+    """cProfile вокруг вьюхи и рендеринга её шаблонов.
+
+    Профилируются запросы сотрудников с параметром _profile и доля
+    PROFILING_SAMPLE_RATE остальных запросов. Профиль сохраняется в
+    кольцевой буфер core.profiling, сотрудник получает его имя
+    в заголовке X-Profile. У потоковых ответов профилируется и выдача
+    тела, а профиль сохраняется, когда поток закончился.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profiles_path = reverse('core:profiles')
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        profiler = profiling.start()
+        if profiler is None:
+            return self.get_response(request)
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        match = request.resolver_match
+        name = profiling.new_name(match.view_name if match else None)
+        meta = {
+            'view': match.view_name if match else None,
+            'path': request.get_full_path(),
+            'method': request.method,
+            'status': response.status_code,
+            'created': timezone.now().isoformat(),
+        }
+
+        def finish():
+            meta['ms'] = round((perf_counter() - started) * 1000, 1)
+            try:
+                profiling.save(profiler, name, meta)
+            except OSError:
+                logger.exception('Не удалось сохранить профиль %s', name)
+                return False
+            return True
+
+        if response.streaming:
+            response.streaming_content = stream_through(
+                response.streaming_content, lambda: profiled(profiler),
+                finish)
+            saved = True
+        else:
+            saved = finish()
+        if saved and request.user.is_staff:
+            response['X-Profile'] = name
+        return response
+
+    def wanted(self, request):
+        if request.path.startswith(self.profiles_path):
+            return False
+        if PROFILE_PARAM in request.GET and request.user.is_staff:
+            return True
+        rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+
+class QueryTimer:
+    """execute_wrapper, считающий запросы и их суммарное время."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Время ответа, число и время запросов к базе по вьюхам.
+
+    Стоит первым, поэтому в замер входят все остальные слои, включая
+    кэш страниц. У потоковых ответов замер заканчивается, когда тело
+    выдано целиком: запросы при выдаче тоже считаются. Метрики
+    копятся в core.metrics и раз в METRICS_FLUSH_SECONDS сбрасываются
+    в общий каталог процессов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryTimer()
+        started = perf_counter()
+        with self.watch(queries):
+            response = self.get_response(request)
+
+        def finish():
+            elapsed = perf_counter() - started
+            match = request.resolver_match
+            view = match.view_name if match else UNRESOLVED
+            metrics.observe(metrics.REQUEST_SECONDS, elapsed, view=view)
+            metrics.inc(metrics.REQUESTS, view=view,
+                        status=str(response.status_code))
+            metrics.inc(metrics.DB_QUERIES, queries.count, view=view)
+            metrics.inc(metrics.DB_SECONDS, queries.seconds, view=view)
+            metrics.flush()
+
+        if response.streaming:
+            response.streaming_content = stream_through(
+                response.streaming_content, lambda: self.watch(queries),
+                finish)
+        else:
+            finish()
+        return response
+
+    @contextmanager
+    def watch(self, queries):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(queries))
+            yield
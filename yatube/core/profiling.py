@@ -0,0 +1,93 @@
+import cProfile
+import json
+import os
+import re
+from datetime import datetime
+
+from django.conf import settings
+
+MAX_FILES = 100
+
+SUFFIX = '.prof'
+
+NAME_RE = re.compile(r'^[\w.-]+\.prof$')
+
+
+def profile_dir():
+    return getattr(settings, 'PROFILING_DIR',
+                   os.path.join(settings.BASE_DIR, 'profiles'))
+
+
+def start():
+    """Включённый профилировщик или None, если уже работает другой."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        return None
+    return profiler
+
+
+def new_name(view):
+    """Имя файла профиля: время снятия и вьюха."""
+    view = re.sub(r'[^\w.-]', '_', view or 'unknown')
+    return f'{datetime.utcnow():%Y%m%dT%H%M%S%f}-{view}{SUFFIX}'
+
+
+def save(profiler, name, meta):
+    """Кладёт профиль в кольцевой буфер под именем из new_name().
+
+    Рядом с профилем лежит JSON с вьюхой, адресом и временем ответа;
+    сверх PROFILING_MAX_FILES удаляются самые старые профили.
+    """
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    profiler.dump_stats(path)
+    with open(path + '.json', 'w') as sidecar:
+        json.dump(meta, sidecar, ensure_ascii=False)
+    prune(directory)
+
+
+def names(directory=None):
+    """Имена сохранённых профилей, новые первыми."""
+    directory = directory or profile_dir()
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        (name for name in os.listdir(directory) if NAME_RE.match(name)),
+        reverse=True,
+    )
+
+
+def prune(directory):
+    limit = getattr(settings, 'PROFILING_MAX_FILES', MAX_FILES)
+    for name in names(directory)[limit:]:
+        for path in (name, name + '.json'):
+            try:
+                os.remove(os.path.join(directory, path))
+            except FileNotFoundError:
+                pass
+
+
+def path_of(name):
+    """Путь к профилю по имени из адреса или None для чужих имён."""
+    if not NAME_RE.match(name):
+        return None
+    path = os.path.join(profile_dir(), name)
+    return path if os.path.isfile(path) else None
+
+
+def entries():
+    """Профили для страницы списка: имя, размер и сохранённые сведения."""
+    result = []
+    for name in names():
+        path = os.path.join(profile_dir(), name)
+        try:
+            with open(path + '.json') as sidecar:
+                meta = json.load(sidecar)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            continue
+        result.append(dict(meta, name=name, size=size))
+    return result
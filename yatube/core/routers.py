@@ -0,0 +1,65 @@
+import random
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_APPS = ('sessions', 'thumbnail')
+
+_state = threading.local()
+
+
+def replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', ()))
+
+
+def allow_replicas(allowed=True):
+    """Разрешает чтения из реплик в текущем потоке."""
+    _state.replicas_allowed = allowed
+
+
+def replicas_allowed():
+    """По умолчанию потоки читают из default.
+
+    Команды, миграции и фоновые задачи читают то, что только что
+    записали, поэтому реплики включает только ReplicaPinMiddleware.
+    """
+    return getattr(_state, 'replicas_allowed', False)
+
+
+def reset_writes():
+    _state.wrote = False
+
+
+def has_written():
+    """Была ли запись в основную базу с последнего reset_writes."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Разрешённые чтения идут в реплики, остальное — в default.
+
+    Сессии и kvstore миниатюр всегда читаются из основной базы: реплика
+    отстаёт, и свежий вход или готовая миниатюра в ней ещё не видны.
+    """
+
+    def db_for_read(self, model, **hints):
+        names = replicas()
+        if (not names or not replicas_allowed()
+                or model._meta.app_label in PRIMARY_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(names)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Реплики не мигрируются: sync_replica копирует их целиком."""
+        return db not in replicas()
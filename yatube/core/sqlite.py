@@ -0,0 +1,49 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+PRAGMA_RE = re.compile(r'^\w+$')
+
+VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def get_pragmas():
+    """Прагмы по умолчанию, дополненные настройкой SQLITE_PRAGMAS.
+
+    Значение None в настройке отключает прагму по умолчанию.
+    """
+    pragmas = dict(DEFAULT_PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {}))
+    for name, value in pragmas.items():
+        if not PRAGMA_RE.match(name) or not (
+                value is None or VALUE_RE.match(str(value))):
+            raise ImproperlyConfigured(
+                f'Недопустимая прагма SQLite: {name} = {value!r}')
+    return {
+        name: value for name, value in pragmas.items() if value is not None
+    }
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite.
+
+    Прагмы действуют только на соединение, поэтому применяются сразу
+    после подключения, пока не открыта транзакция.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in get_pragmas().items():
+            cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,25 @@
+from django import template
+
+from posts.thumbnails import picture, prefetch, set_variants
+
+register = template.Library()
+
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+
+@register.inclusion_tag('includes/post_picture.html')
+def post_picture(post, image_set, lazy=True):
+    """Картинка поста в нескольких ширинах, WebP с запасным JPEG.
+
+    Вне лент варианты никто не выбрал заранее: их читает один prefetch,
+    а не отдельный запрос к kvstore на каждый вариант.
+    """
+    prefetched = getattr(post, '_thumbnails', {})
+    if post.image and any(variant not in prefetched
+                          for _, _, variant in set_variants(image_set)):
+        prefetch([post], image_set)
+    return {
+        'picture': picture(post, image_set),
+        'sizes': SIZES,
+        'lazy': lazy,
+    }
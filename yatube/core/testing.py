@@ -0,0 +1,112 @@
+import re
+import traceback
+from collections import Counter
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+N_PLUS_ONE_REPEATS = 3
+
+STACK_DEPTH = 6
+
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+IN_LIST_RE = re.compile(r'IN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+
+
+def query_shape(sql):
+    """SQL без значений: одинаковые по форме запросы совпадают."""
+    sql = LITERAL_RE.sub('?', sql)
+    return IN_LIST_RE.sub('IN (...)', sql)
+
+
+def _project_stack():
+    """Кадры стека из кода проекта, без Django и самого замера."""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+class QueryRecorder:
+    """Записывает запросы соединения вместе со временем и стеком вызова."""
+
+    def __init__(self, using=connection):
+        self.connection = using
+        self.queries = []
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'params': params,
+                'ms': (perf_counter() - started) * 1000,
+                'stack': _project_stack(),
+            })
+
+    @property
+    def total_ms(self):
+        return sum(query['ms'] for query in self.queries)
+
+    def repeated(self, repeats=N_PLUS_ONE_REPEATS):
+        """Формы запросов, выполненных repeats раз и больше: похоже на N+1."""
+        shapes = Counter(query_shape(query['sql']) for query in self.queries)
+        return {
+            shape: count for shape, count in shapes.items()
+            if count >= repeats
+        }
+
+
+def format_queries(queries):
+    lines = []
+    for number, query in enumerate(queries, 1):
+        lines.append(
+            f'{number}. {query["sql"]} {query["params"]!r} '
+            f'({query["ms"]:.2f} мс)')
+        lines += [
+            f'     {frame.filename}:{frame.lineno} in {frame.name}'
+            for frame in query['stack']
+        ]
+    return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """Проверка бюджета запросов вьюхи для TestCase.
+
+    При превышении бюджета или повторе одного запроса в цикле тест
+    падает со списком SQL и местами в коде проекта, откуда они пришли.
+    """
+
+    n_plus_one_repeats = N_PLUS_ONE_REPEATS
+
+    def assertWithinBudget(self, budget, func, *args, **kwargs):
+        with QueryRecorder() as recorder:
+            result = func(*args, **kwargs)
+        queries = recorder.queries
+        problems = []
+        if len(queries) > budget.queries:
+            problems.append(
+                f'{len(queries)} запросов при бюджете {budget.queries}')
+        if recorder.total_ms > budget.ms:
+            problems.append(
+                f'{recorder.total_ms:.1f} мс в SQL при бюджете {budget.ms}')
+        for shape, count in recorder.repeated(self.n_plus_one_repeats).items():
+            problems.append(f'N+1: {count} раз {shape}')
+        if problems:
+            self.fail('\n'.join(problems) + '\n' + format_queries(queries))
+        return result
@@ -1,4 +1,35 @@
-from django.test import TestCase
+import os
+import pstats
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connection, connections
+from django.template import Context, Template
+from django.http import HttpResponse
+from django.test import (Client, RequestFactory, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from posts.caching import (JOURNAL_KEY, get_generations, group_feed,
+                           journal_position, profile_feed)
+from posts.models import Group, Post
+
+from . import metrics, profiling
+from .budgets import QueryBudget, query_budget
+from .middleware import PIN_COOKIE, ReplicaPinMiddleware
+from .routers import ReplicaRouter, allow_replicas, replicas_allowed
+from .sqlite import DEFAULT_PRAGMAS, get_pragmas
+from .testing import QueryBudgetMixin, query_shape
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +37,488 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class PostCardTagTests(TestCase):
+    template = Template(
+        '{% load post_cards %}'
+        '{% post_card posts show_author_link=True cached=cached as cards %}'
+        '{% for card in cards %}{{ card }}<hr>{% endfor %}'
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='CardAuthor')
+        for num in range(3):
+            Post.objects.create(author=author, text=f'Карточка {num}')
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, cached=True):
+        posts = Post.objects.for_feed()
+        return self.template.render(
+            Context({'posts': posts, 'cached': cached}))
+
+    def test_cards_are_rendered_in_order(self):
+        """Карточки идут в порядке постов, каждая отдельной строкой."""
+        html = self.render()
+        self.assertEqual(html.count('<article>'), 3)
+        self.assertEqual(html.count('</article>\n<hr>'), 3)
+        positions = [html.index(f'Карточка {num}') for num in (2, 1, 0)]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('Автор:', html)
+
+    def test_cached_cards_are_not_rendered_again(self):
+        """Закэшированные карточки не рендерятся повторно."""
+        with self.assertTemplateUsed('includes/post_viewer.html'):
+            first = self.render()
+        with self.assertTemplateNotUsed('includes/post_viewer.html'):
+            self.assertEqual(self.render(), first)
+
+    def test_uncached_render_skips_cache(self):
+        """cached=False не читает и не пишет кэш карточек."""
+        self.render(cached=False)
+        with self.assertTemplateUsed('includes/post_viewer.html'):
+            self.render()
+
+
+class SqlitePragmasTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_gets_pragmas(self):
+        """Новое соединение получает прагмы по умолчанию."""
+        self.assertEqual(
+            self.pragma('busy_timeout'), DEFAULT_PRAGMAS['busy_timeout'])
+        self.assertEqual(
+            self.pragma('cache_size'), DEFAULT_PRAGMAS['cache_size'])
+        self.assertEqual(self.pragma('synchronous'), 1)
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 100, 'mmap_size': None})
+    def test_settings_override_defaults(self):
+        """SQLITE_PRAGMAS меняет значения, а None отключает прагму."""
+        pragmas = get_pragmas()
+        self.assertEqual(pragmas['busy_timeout'], 100)
+        self.assertNotIn('mmap_size', pragmas)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size; DROP': 1})
+    def test_invalid_pragma_is_rejected(self):
+        """Имена и значения прагм не подставляются в SQL без проверки."""
+        with self.assertRaises(ImproperlyConfigured):
+            get_pragmas()
+
+
+class SqliteMaintenanceTests(TransactionTestCase):
+    def run_command(self, *args):
+        out = StringIO()
+        call_command('sqlite_maintenance', *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_maintenance_switches_to_incremental_vacuum(self):
+        """Первый запуск переводит базу на incremental_vacuum."""
+        output = self.run_command('--checkpoint', 'passive')
+        self.assertIn('auto_vacuum=INCREMENTAL', output)
+        output = self.run_command('--vacuum-pages', '10')
+        self.assertIn('Освобождено страниц', output)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s",
+                           ['sqlite_stat1'])
+            self.assertIsNotNone(cursor.fetchone())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    router = ReplicaRouter()
+
+    def tearDown(self):
+        allow_replicas(False)
+
+    def test_reads_go_to_replica_and_writes_to_primary(self):
+        """Чтения уходят в реплику, записи и сессии — в основную базу."""
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        allow_replicas()
+        self.assertEqual(self.router.db_for_read(Post), 'replica1')
+        self.assertEqual(self.router.db_for_read(Session), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_writer_is_pinned_to_primary(self):
+        """После записи пользователь читает из основной базы по куке."""
+        seen = []
+
+        def view(request):
+            seen.append(replicas_allowed())
+            if request.method == 'POST':
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        self.assertNotIn(PIN_COOKIE, middleware(factory.get('/')).cookies)
+        response = middleware(factory.post('/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        request = factory.get('/')
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        middleware(request)
+        self.assertEqual(seen, [True, False, False])
+        self.assertFalse(replicas_allowed())
+
+    def test_user_is_pinned_without_cookie(self):
+        """Пользователь закреплён по id и в запросах без куки."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        seen = []
+
+        def view(request):
+            seen.append(replicas_allowed())
+            if request.method == 'POST':
+                self.router.db_for_write(Post)
+            return HttpResponse()
+
+        middleware = ReplicaPinMiddleware(view)
+        factory = RequestFactory()
+        writer = User.objects.create_user(username='Writer')
+        other = User.objects.create_user(username='Reader')
+        for user, method in ((writer, factory.post), (writer, factory.get),
+                             (other, factory.get)):
+            request = method('/')
+            request.user = user
+            middleware(request)
+        self.assertEqual(seen, [False, False, True])
+
+
+class SyncReplicaTests(TransactionTestCase):
+    def test_sync_replica_copies_primary(self):
+        """sync_replica копирует данные основной базы в файл реплики."""
+        author = User.objects.create_user(username='Replicated')
+        Post.objects.create(author=author, text='Пост для реплики')
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        replica = {'replica1': {'NAME': path}}
+        with mock.patch.dict(connections.databases, replica):
+            call_command('sync_replica', 'replica1', stdout=StringIO())
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        texts = replica.execute('SELECT text FROM posts_post').fetchall()
+        self.assertEqual(texts, [('Пост для реплики',)])
+
+    def sync_twice(self, between, queries):
+        """Две синхронизации с изменениями между ними.
+
+        Возвращает, на сколько сдвинулись поколения лент профилей
+        автора нового поста и постороннего и ленты его группы;
+        queries — сколько запросов к базе делает вторая синхронизация.
+        """
+        cache.clear()
+        self.addCleanup(cache.clear)
+        author = User.objects.create_user(username='Author')
+        other = User.objects.create_user(username='Other')
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        Post.objects.create(author=other, text='Старый пост')
+        handle, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        replica = {'replica1': {'NAME': path}}
+        feeds = (profile_feed(author.pk), group_feed(group.pk),
+                 profile_feed(other.pk))
+        with mock.patch.dict(connections.databases, replica):
+            call_command('sync_replica', 'replica1', stdout=StringIO())
+            Post.objects.create(author=author, group=group, text='Новый')
+            between()
+            before = get_generations(*feeds)
+            with self.assertNumQueries(queries):
+                call_command('sync_replica', 'replica1', stdout=StringIO())
+        after = get_generations(*feeds)
+        return [new - old for old, new in zip(before, after)]
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_sync_bumps_only_changed_feeds(self):
+        """Повторная синхронизация сбрасывает ленты из журнала сдвигов."""
+        self.assertEqual(self.sync_twice(lambda: None, 0), [1, 1, 0])
+
+    @override_settings(DATABASE_REPLICAS=['replica1'])
+    def test_lost_journal_bumps_all_feeds(self):
+        """Без части журнала сбрасываются все ленты."""
+        def lose_journal():
+            cache.delete(f'{JOURNAL_KEY}:{journal_position()}')
+
+        self.assertEqual(self.sync_twice(lose_journal, 3), [1, 1, 1])
+
+
+class QueryBudgetMixinTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for num in range(3):
+            author = User.objects.create_user(username=f'Budget{num}')
+            Post.objects.create(author=author, text=f'Пост {num}')
+
+    def authors(self, queryset):
+        return [post.author.username for post in queryset]
+
+    def test_query_budget_marks_view(self):
+        """Декоратор только помечает вьюху бюджетом."""
+        def view(request):
+            return None
+
+        self.assertIs(query_budget(queries=2, ms=10)(view), view)
+        self.assertEqual(view.query_budget, QueryBudget(2, 10))
+
+    def test_query_shape_ignores_values(self):
+        """Запросы, различающиеся только значениями, имеют одну форму."""
+        self.assertEqual(
+            query_shape("SELECT 1 FROM t WHERE a = 5 AND b = 'x' "
+                        "AND c IN (%s, %s)"),
+            "SELECT ? FROM t WHERE a = ? AND b = ? AND c IN (...)")
+
+    def test_within_budget_returns_result(self):
+        """Запросы в пределах бюджета не мешают получить результат."""
+        authors = self.assertWithinBudget(
+            QueryBudget(1, 100), self.authors,
+            Post.objects.select_related('author'))
+        self.assertEqual(len(authors), 3)
+
+    def test_n_plus_one_fails_with_stack(self):
+        """Повтор запроса в цикле — ошибка со стеком из кода проекта."""
+        with self.assertRaises(AssertionError) as error:
+            self.assertWithinBudget(
+                QueryBudget(10, 100), self.authors, Post.objects.all())
+        message = str(error.exception)
+        self.assertIn('N+1: 3 раз', message)
+        self.assertIn('core/tests.py', message)
+        self.assertIn('in authors', message)
+
+    def test_over_budget_lists_queries(self):
+        """Превышение бюджета показывает число запросов и их SQL."""
+        with self.assertRaises(AssertionError) as error:
+            self.assertWithinBudget(
+                QueryBudget(0, 100), list, Post.objects.all())
+        self.assertIn('1 запросов при бюджете 0', str(error.exception))
+        self.assertIn('FROM "posts_post"', str(error.exception))
+
+
+@override_settings(PROFILING_MAX_FILES=2)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp()
+        cls.dir_settings = override_settings(PROFILING_DIR=cls.dir)
+        cls.dir_settings.enable()
+        cls.staff = User.objects.create_user(username='Staff', is_staff=True)
+        cls.user = User.objects.create_user(username='Reader')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.dir_settings.disable()
+        shutil.rmtree(cls.dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_staff_profiles_request_on_demand(self):
+        """Сотрудник снимает профиль параметром и скачивает его."""
+        self.assertNotIn(
+            'X-Profile', self.staff_client.get(reverse('posts:index')))
+        response = self.staff_client.get(reverse('posts:index') + '?_profile')
+        name = response['X-Profile']
+        self.assertIn('posts_index', name)
+        listing = self.staff_client.get(reverse('core:profiles'))
+        self.assertContains(listing, 'posts:index')
+        download = self.staff_client.get(
+            reverse('core:profile_download', args=(name,)))
+        self.assertIn('attachment', download['Content-Disposition'])
+        pstats.Stats(profiling.path_of(name))
+
+    def test_profiles_are_kept_in_ring_buffer(self):
+        """Хранятся только последние PROFILING_MAX_FILES профилей."""
+        url = reverse('posts:index') + '?_profile'
+        saved = [self.staff_client.get(url)['X-Profile'] for _ in range(3)]
+        self.assertEqual(profiling.names(), saved[:0:-1])
+        self.assertEqual(len(os.listdir(self.dir)), 4)
+
+    def test_sampling_profiles_anonymous_requests(self):
+        """Доля PROFILING_SAMPLE_RATE профилирует и обычные запросы."""
+        client = Client()
+        client.get(reverse('posts:search') + '?_profile')
+        self.assertEqual(profiling.names(), [])
+        with override_settings(PROFILING_SAMPLE_RATE=1):
+            response = client.get(reverse('posts:search'))
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(len(profiling.names()), 1)
+
+    def test_profiles_are_staff_only(self):
+        """Список и файлы профилей недоступны обычным пользователям."""
+        client = Client()
+        client.force_login(self.user)
+        name = self.staff_client.get(
+            reverse('posts:index') + '?_profile')['X-Profile']
+        for url in (reverse('core:profiles'),
+                    reverse('core:profile_download', args=(name,))):
+            with self.subTest(url=url):
+                self.assertEqual(client.get(url).status_code, 302)
+        missing = reverse('core:profile_download', args=('..%2Fdb.prof',))
+        self.assertEqual(self.staff_client.get(missing).status_code, 404)
+
+    def test_failed_save_keeps_response(self):
+        """Ошибка записи профиля не ломает ответ."""
+        url = reverse('posts:index') + '?_profile'
+        with mock.patch.object(profiling, 'save', side_effect=OSError), \
+                self.assertLogs('core.middleware', 'ERROR'):
+            response = self.staff_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+
+    def test_streaming_response_is_profiled_to_the_end(self):
+        """Профиль потокового ответа сохраняется после выдачи тела."""
+        Post.objects.create(
+            author=self.staff, text='Пост в потоке')
+        response = self.staff_client.get(
+            reverse('api:post_list') + '?_profile')
+        self.assertTrue(response.streaming)
+        self.assertEqual(profiling.names(), [])
+        body = b''.join(response.streaming_content)
+        self.assertIn('Пост в потоке', body.decode())
+        self.assertEqual(profiling.names(), [response['X-Profile']])
+        stats = pstats.Stats(profiling.path_of(response['X-Profile']))
+        self.assertTrue(any(
+            function == 'chunks' for _, _, function in stats.stats))
+
+
+def samples(text):
+    """Строки с замерами экспозиции: {имя с метками: значение}."""
+    return {
+        line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+        for line in text.splitlines() if not line.startswith('#')
+    }
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def scrape(self):
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return samples(response.content.decode())
+
+    def test_requests_are_measured_per_view(self):
+        """Время ответа, запросы к базе и шаблоны учитываются по вьюхам."""
+        client = Client()
+        client.force_login(User.objects.create_user(username='Metrics'))
+        client.get(reverse('posts:index'))
+        client.get('/nonexist-page/')
+        values = self.scrape()
+        self.assertEqual(values[
+            'yatube_request_duration_seconds_count{view="posts:index"}'], 1)
+        self.assertEqual(values[
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"}'], 1)
+        self.assertEqual(values[
+            'yatube_requests_total{status="404",view="unresolved"}'], 1)
+        self.assertGreater(
+            values['yatube_db_queries_total{view="posts:index"}'], 0)
+        self.assertGreater(
+            values['yatube_db_query_seconds_total{view="posts:index"}'], 0)
+        self.assertEqual(values[
+            'yatube_template_render_seconds_count'
+            '{template="posts/index.html"}'], 1)
+
+    def test_cache_lookups_are_counted_by_kind(self):
+        """Фрагменты, страницы и ключи sorl считаются отдельно."""
+        client = Client()
+        for _ in range(2):
+            client.get(reverse('posts:index'))
+        cache.get_many(['sorl-thumbnail||image||missing'])
+        values = self.scrape()
+        self.assertEqual(values[
+            'yatube_cache_requests_total{kind="page",result="miss"}'], 1)
+        self.assertEqual(values[
+            'yatube_cache_requests_total{kind="page",result="hit"}'], 1)
+        self.assertEqual(values[
+            'yatube_requests_total{status="200",view="posts:index"}'], 2)
+        self.assertEqual(values[
+            'yatube_cache_requests_total{kind="fragment",result="miss"}'], 1)
+        self.assertEqual(values[
+            'yatube_cache_requests_total{kind="sorl",result="miss"}'], 1)
+        self.assertEqual(values['yatube_cache_hit_ratio{kind="page"}'], 0.5)
+
+    def test_processes_are_aggregated(self):
+        """Эндпоинт суммирует файлы метрик всех процессов."""
+        with self.settings(METRICS_DIR=self.dir):
+            metrics.inc(metrics.REQUESTS, view='other', status='200')
+            metrics.flush(force=True)
+            os.replace(
+                os.path.join(self.dir, f'{metrics.process_name()}.json'),
+                os.path.join(self.dir, '1.json'))
+            metrics.reset()
+            metrics.inc(metrics.REQUESTS, 2, view='other', status='200')
+            self.assertEqual(self.scrape()[
+                'yatube_requests_total{status="200",view="other"}'], 3)
+
+    def test_process_files_survive_pid_reuse(self):
+        """Процесс с тем же pid не затирает файл прежнего."""
+        name = metrics.process_name()
+        self.assertTrue(name.startswith(f'{os.getpid()}-'))
+        self.assertEqual(metrics.process_name(), name)
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            forked = metrics.process_name()
+        self.assertFalse(forked.startswith(f'{os.getpid()}-'))
+        # Тот же pid после другого процесса — это уже новый процесс.
+        self.assertNotEqual(metrics.process_name(), name)
+
+    def test_failed_flush_is_logged(self):
+        """Ошибка записи метрик попадает в лог, а не в ответ."""
+        handle, path = tempfile.mkstemp(dir=self.dir)
+        os.close(handle)
+        with self.settings(METRICS_DIR=path), \
+                self.assertLogs('core.metrics', 'ERROR'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_streaming_is_measured_after_body(self):
+        """Потоковый ответ учитывается, когда его тело выдано."""
+        Post.objects.create(
+            author=User.objects.create_user(username='Streamer'),
+            text='Пост в потоке')
+        response = self.client.get(reverse('api:post_list'))
+        self.assertTrue(response.streaming)
+        views = [dict(labels).get('view')
+                 for _, labels, _ in metrics.snapshot()['counters']]
+        self.assertNotIn('api:post_list', views)
+        b''.join(response.streaming_content)
+        values = self.scrape()
+        self.assertEqual(values[
+            'yatube_requests_total{status="200",view="api:post_list"}'], 1)
+        self.assertGreater(
+            values['yatube_db_queries_total{view="api:post_list"}'], 0)
+
+    @override_settings(METRICS_ALLOWED_IPS=[])
+    def test_metrics_are_restricted(self):
+        """Чужим адресам метрики недоступны, сотрудникам доступны."""
+        url = reverse('core:metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(
+            User.objects.create_user(username='Staff', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -0,0 +1,12 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:name>/', views.profile_download,
+         name='profile_download'),
+    path('metrics', views.metrics, name='metrics'),
+]
@@ -1,5 +1,12 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
 
+from . import profiling
+from .metrics import CONTENT_TYPE, exposition
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,26 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+@staff_member_required
+def profiles(request):
+    return render(request, 'core/profiles.html', {
+        'profiles': profiling.entries()})
+
+
+@staff_member_required
+def profile_download(request, name):
+    path = profiling.path_of(name)
+    if path is None:
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+
+
+def metrics(request):
+    """Метрики для Prometheus: с адресов METRICS_ALLOWED_IPS и сотрудникам."""
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if (request.META.get('REMOTE_ADDR') not in allowed
+            and not request.user.is_staff):
+        raise PermissionDenied
+    return HttpResponse(exposition(), content_type=CONTENT_TYPE)
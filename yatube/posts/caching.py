@@ -0,0 +1,146 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .pagination import CURSOR_PARAMS
+
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+PAGE_PARAMS = ('page',) + CURSOR_PARAMS
+
+INDEX_FEED = 'index'
+
+JOURNAL_KEY = 'journal:generations'
+
+JOURNAL_TIMEOUT = 60 * 60 * 24
+
+JOURNAL_MAX_ENTRIES = 10_000
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'profile:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def post_feed(post_id):
+    return f'post:{post_id}'
+
+
+def _digest(value):
+    """Хэш значения для ключа кэша: в именах и slug бывают юникод и пробелы,
+    недопустимые в ключах memcached."""
+    return md5(value.encode()).hexdigest()
+
+
+def username_feed(username):
+    return f'username:{_digest(username)}'
+
+
+def slug_feed(slug):
+    return f'slug:{_digest(slug)}'
+
+
+def _generation_key(name):
+    return f'generation:{name}'
+
+
+def get_generations(*names):
+    """Текущие номера поколений лент; отсутствующее поколение равно 0."""
+    keys = [_generation_key(name) for name in names]
+    stored = cache.get_many(keys)
+    return [stored.get(key, 0) for key in keys]
+
+
+def _incr(key):
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+        return 1
+
+
+def bump_generation(*names, journal=True):
+    """Сдвигает поколения лент, делая их закэшированные фрагменты мёртвыми.
+
+    При настроенных репликах сдвиг попадает в журнал: sync_replica
+    сдвигает эти ленты ещё раз, когда реплика догонит основную базу.
+    """
+    for name in names:
+        _incr(_generation_key(name))
+    if journal and names and getattr(settings, 'DATABASE_REPLICAS', None):
+        position = _incr(JOURNAL_KEY)
+        cache.set(f'{JOURNAL_KEY}:{position}', list(names), JOURNAL_TIMEOUT)
+
+
+def journal_position():
+    return cache.get(JOURNAL_KEY, 0)
+
+
+def journaled_feeds(start, end):
+    """Ленты из записей журнала (start, end].
+
+    None, если записей слишком много или часть уже вытеснена из кэша:
+    тогда неизвестно, какие ленты менялись.
+    """
+    if end - start > JOURNAL_MAX_ENTRIES:
+        return None
+    keys = [f'{JOURNAL_KEY}:{position}'
+            for position in range(start + 1, end + 1)]
+    entries = cache.get_many(keys)
+    if len(entries) != len(keys):
+        return None
+    return {name for names in entries.values() for name in names}
+
+
+def post_feeds(post, group_id=None):
+    """Ленты, в которых показывается пост."""
+    feeds = {INDEX_FEED, profile_feed(post.author_id)}
+    for group in (post.group_id, group_id):
+        if group is not None:
+            feeds.add(group_feed(group))
+    return feeds
+
+
+def feed_cache(request, *feeds):
+    """Таймаут и ключ для {% cache %} ленты.
+
+    Ключ зависит от ленты, номера страницы или курсора и поколений
+    лент, поэтому любое изменение поста сразу делает фрагмент устаревшим.
+    """
+    generations = get_generations(*feeds)
+    parts = [
+        f'{feed}={generation}'
+        for feed, generation in zip(feeds, generations)
+    ]
+    parts += [
+        f'{param}={request.GET.get(param)}' for param in PAGE_PARAMS
+    ]
+    return {'timeout': FEED_CACHE_TIMEOUT, 'key': '&'.join(parts)}
+
+
+def card_key(post, thumbnails_ready, *flags):
+    """Ключ кэша отрендеренной карточки поста.
+
+    Ключ меняется при правке поста, его группы или имени автора и когда
+    готовы новые миниатюры, поэтому карточку не нужно сбрасывать вручную.
+    Имя входит хэшем: в нём бывают пробелы и оно может быть длинным.
+    """
+    author = post.author
+    name = f'{author.username}|{author.get_full_name()}'
+    parts = [str(post.pk), post.updated_at.isoformat(),
+             _digest(name)[:8],
+             str(thumbnails_ready), *(str(int(flag)) for flag in flags)]
+    if post.group is not None:
+        parts.append(post.group.updated_at.isoformat())
+    return 'post_card:' + '&'.join(parts)
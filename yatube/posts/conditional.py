@@ -0,0 +1,68 @@
+from hashlib import md5
+
+from django.conf import settings
+
+from .caching import (INDEX_FEED, get_generations, group_feed, post_feed,
+                      profile_feed, slug_feed, username_feed)
+from .models import Group, Post, User
+
+
+def _etag(request, feeds, *parts):
+    """ETag страницы по поколениям лент, адресу, сессии и токену CSRF.
+
+    Сессия берётся из куки, без загрузки пользователя: у разных
+    посетителей разные шапки страниц, а вход меняет ключ сессии.
+    Кука CSRF нужна формам страницы: без неё из кэша браузера
+    приходила бы форма со старым токеном.
+    """
+    generations = get_generations(*feeds)
+    # По этим поколениям кэш страниц проверяет, не устарела ли страница.
+    request.page_generations = dict(zip(feeds, generations))
+    parts = [
+        request.get_full_path(),
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        *map(str, generations),
+        *map(str, parts),
+    ]
+    return md5('|'.join(parts).encode()).hexdigest()
+
+
+def index_etag(request):
+    return _etag(request, [INDEX_FEED])
+
+
+def group_etag(request, slug):
+    group = Group.objects.filter(slug=slug).values_list(
+        'pk', 'updated_at').first()
+    if group is None:
+        return None
+    group_id, updated_at = group
+    return _etag(request, [group_feed(group_id), slug_feed(slug)],
+                 updated_at.isoformat())
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if author_id is None:
+        return None
+    return _etag(request, [profile_feed(author_id), username_feed(username)])
+
+
+def post_etag(request, post_id):
+    """ETag страницы поста.
+
+    Last-Modified у страниц поста нет: дата поста не знает ни о входе
+    и выходе, ни о подписках и счётчиках автора, и If-Modified-Since
+    отдавал бы 304 на устаревшую страницу.
+    """
+    state = Post.objects.filter(pk=post_id).values_list(
+        'updated_at', 'author_id', 'group_id').first()
+    if state is None:
+        return None
+    updated_at, author_id, group_id = state
+    feeds = [profile_feed(author_id), post_feed(post_id)]
+    if group_id is not None:
+        feeds.append(group_feed(group_id))
+    return _etag(request, feeds, updated_at.isoformat())
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+def _count(model, field, outer):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef(outer)})
+        .order_by().values(field)
+        .annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def rebuild_counters():
+    """Пересчитывает все денормализованные счётчики с нуля."""
+    missing = User.objects.filter(counters__isnull=True).values_list(
+        'pk', flat=True)
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id) for user_id in missing.iterator())
+    UserCounters.objects.update(
+        posts_count=_count(Post, 'author', 'user'),
+        followers_count=_count(Follow, 'author', 'user'),
+        following_count=_count(Follow, 'user', 'user'),
+    )
+    Post.objects.update(comments_count=_count(Comment, 'post', 'pk'))
@@ -0,0 +1,156 @@
+from hashlib import md5
+
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+
+from core.budgets import query_budget
+
+from .caching import (FEED_CACHE_TIMEOUT, INDEX_FEED, get_generations,
+                      group_feed, profile_feed)
+from .models import Group, Post, User
+
+FEED_ITEMS = 20
+
+
+class LatestPostsFeed(Feed):
+    """RSS последних постов сайта."""
+
+    title = 'Yatube: последние записи'
+    description = 'Последние обновления на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def items(self):
+        return Post.objects.for_feed()[:FEED_ITEMS]
+
+    def item_title(self, post):
+        return Truncator(post.text).words(10)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=(post.pk,))
+
+    def item_pubdate(self, post):
+        return post.pub_date
+
+    def item_updateddate(self, post):
+        return post.updated_at
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_author_link(self, post):
+        return reverse('posts:profile', args=(post.author.username,))
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    """RSS постов группы."""
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', args=(group.slug,))
+
+    def items(self, group):
+        return group.posts.for_feed()[:FEED_ITEMS]
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    """RSS постов автора."""
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=(author.username,))
+
+    def items(self, author):
+        return author.posts.for_feed()[:FEED_ITEMS]
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, group):
+        return self.description(group)
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, author):
+        return self.description(author)
+
+
+def index_feeds():
+    return [INDEX_FEED]
+
+
+def group_feeds(slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    return group_id and [group_feed(group_id)]
+
+
+def author_feeds(username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    return author_id and [profile_feed(author_id)]
+
+
+def cached_feed(feed, feed_names):
+    """Вьюха ленты, закэшированной до изменения её постов.
+
+    Версия ленты — поколения её кэша, поэтому и ETag, и ключ кэша
+    считаются без запросов к постам; повторный опрос получает 304.
+    В ключ входят схема и хост: ссылки в ленте абсолютные.
+    """
+    feed_view = feed()
+
+    def view(request, **kwargs):
+        names = feed_names(**kwargs)
+        if not names:
+            raise Http404
+        parts = [request.build_absolute_uri('/'), request.path,
+                 *map(str, get_generations(*names))]
+        version = md5('|'.join(parts).encode()).hexdigest()
+        etag = f'"{version}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        key = f'syndication:{version}'
+        response = cache.get(key)
+        if response is None:
+            response = feed_view(request, **kwargs)
+            response['ETag'] = etag
+            cache.set(key, response, FEED_CACHE_TIMEOUT)
+        return response
+
+    return query_budget(queries=3)(view)
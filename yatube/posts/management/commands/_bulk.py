@@ -0,0 +1,44 @@
+"""Общее для export_posts и import_posts: формат JSONL и даты."""
+from contextlib import contextmanager
+
+from django.utils.dateparse import parse_datetime
+
+# Типы записей в порядке зависимостей: импорт опирается на то, что
+# группы идут раньше постов, а посты — раньше комментариев.
+RECORD_TYPES = ('group', 'post', 'comment', 'follow')
+
+DATE_FIELDS = ('pub_date', 'created', 'updated_at')
+
+
+def dump_dates(record):
+    for field in DATE_FIELDS:
+        if record.get(field) is not None:
+            record[field] = record[field].isoformat()
+    return record
+
+
+def load_dates(record):
+    for field in DATE_FIELDS:
+        if record.get(field) is not None:
+            record[field] = parse_datetime(record[field])
+    return record
+
+
+@contextmanager
+def explicit_dates(*models):
+    """Отключает auto_now и auto_now_add, чтобы сохранить даты из файла."""
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
@@ -0,0 +1,73 @@
+import math
+from statistics import median
+from timeit import repeat
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template import Context, Engine
+
+from posts.models import Post
+from posts.pagination import POSTS_PER_PAGE
+from posts.thumbnails import prefetch
+
+INCLUDE_LOOP = (
+    "{% for post in posts %}"
+    "{% include 'includes/post_viewer.html' "
+    "with show_author_link=True show_group_link=True %}"
+    "{% if not forloop.last %}<hr>{% endif %}"
+    "{% endfor %}"
+)
+
+POST_CARD = (
+    "{% load post_cards %}"
+    "{% post_card posts show_author_link=True show_group_link=True "
+    "cached=cached as cards %}"
+    "{% for card in cards %}"
+    "{{ card }}{% if not forloop.last %}<hr>{% endif %}"
+    "{% endfor %}"
+)
+
+
+class Command(BaseCommand):
+    help = ('Замеряет рендеринг страницы ленты: include в цикле '
+            'против тега post_card без кэша и с кэшем карточек.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=POSTS_PER_PAGE,
+            help='Постов на странице.')
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз рендерить каждую страницу.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1.')
+        posts = list(Post.objects.for_feed()[:options['posts']])
+        if not posts:
+            raise CommandError('Нет постов для замера.')
+        prefetch(posts, 'feed')
+        engine = Engine.get_default()
+        cases = (
+            ('include в цикле', INCLUDE_LOOP, {}),
+            ('post_card без кэша', POST_CARD, {'cached': False}),
+            ('post_card с кэшем', POST_CARD, {'cached': True}),
+        )
+        self.stdout.write(
+            f'Страница из {len(posts)} постов, '
+            f'{options["repeat"]} повторов, мс на страницу:')
+        for title, source, extra in cases:
+            template = engine.from_string(source)
+
+            def render():
+                template.render(Context({'posts': posts, **extra}))
+
+            render()
+            timings = sorted(
+                seconds * 1000 for seconds in
+                repeat(render, number=1, repeat=options['repeat'])
+            )
+            p95 = timings[max(math.ceil(len(timings) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f'  {title:<20} медиана {median(timings):7.2f}  '
+                f'p95 {p95:7.2f}')
+        self.stdout.write(self.style.SUCCESS('Готово.'))
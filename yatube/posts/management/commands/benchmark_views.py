@@ -0,0 +1,161 @@
+import json
+import math
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post, User, UserCounters
+
+PERCENTILES = (50, 95, 99)
+
+COMPARED = ('p50', 'p95')
+
+DEEP_PAGE = 50
+
+TOLERANCE = 0.2
+
+
+def percentile(timings, rank):
+    """Перцентиль по ближайшему рангу из отсортированных замеров."""
+    return timings[max(math.ceil(rank / 100 * len(timings)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет ленты и страницу поста через тестовый клиент на '
+            'текущих данных (см. seed_benchmark), пишет p50/p95/p99 и '
+            'число запросов в JSON и падает, если результаты хуже базовых.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Сколько раз запрашивать каждую страницу.')
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда записать результаты.')
+        parser.add_argument(
+            '--baseline',
+            help='Файл с прошлыми результатами для сравнения.')
+        parser.add_argument(
+            '--tolerance', type=float, default=TOLERANCE,
+            help='Допустимое ухудшение p50 и p95, доля от базового.')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.')
+
+    def handle(self, *args, **options):
+        reader, urls = self.scenarios()
+        client = Client()
+        client.force_login(reader)
+        results = {
+            name: self.measure(client, url, options['requests'],
+                               options['cold'])
+            for name, url in urls.items()
+        }
+        report = {
+            'dataset': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Post, Comment, Follow)
+            },
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'views': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<14} p50 {result["p50"]:8.2f}  '
+                f'p95 {result["p95"]:8.2f}  p99 {result["p99"]:8.2f} мс  '
+                f'запросов {result["queries"]}')
+        if options['baseline']:
+            self.compare(report, options['baseline'], options['tolerance'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}.'))
+
+    def scenarios(self):
+        """Самые тяжёлые страницы данных: крупнейшие группа, автор, лента."""
+        reader = (
+            UserCounters.objects.order_by('-following_count')
+            .select_related('user').first()
+        )
+        author = UserCounters.objects.order_by('-posts_count').first()
+        post = Post.objects.order_by('-comments_count').first()
+        group = (
+            Post.objects.exclude(group=None).order_by()
+            .values('group__slug').annotate(total=Count('pk'))
+            .order_by('-total').first()
+        )
+        if not (reader and author and post and group):
+            raise CommandError(
+                'Данных мало для замеров, запустите seed_benchmark.')
+        index = reverse('posts:index')
+        return reader.user, {
+            'index': index,
+            'index_deep': f'{index}?page={DEEP_PAGE}',
+            'index_cursor': f'{index}?after=',
+            'group_list': reverse(
+                'posts:group_list', args=(group['group__slug'],)),
+            'profile': reverse(
+                'posts:profile', args=(author.user.username,)),
+            'post_detail': reverse('posts:post_detail', args=(post.pk,)),
+            'follow_index': reverse('posts:follow_index'),
+        }
+
+    def measure(self, client, url, requests, cold):
+        def get():
+            if cold:
+                cache.clear()
+            response = client.get(url)
+            if response.status_code != 200:
+                raise CommandError(f'{url}: ответ {response.status_code}.')
+
+        get()
+        timings = []
+        for _ in range(requests):
+            started = perf_counter()
+            get()
+            timings.append((perf_counter() - started) * 1000)
+        timings.sort()
+        with CaptureQueriesContext(connection) as queries:
+            get()
+        result = {
+            f'p{rank}': round(percentile(timings, rank), 3)
+            for rank in PERCENTILES
+        }
+        result.update(url=url, queries=len(queries))
+        return result
+
+    def compare(self, report, path, tolerance):
+        """Сравнивает с базовыми результатами по p50, p95 и числу запросов.
+
+        p99 только записывается: на десятках запросов он слишком шумный.
+        """
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline['cold'] != report['cold']:
+            raise CommandError('Базовые замеры сняты в другом режиме кэша.')
+        regressions = []
+        for name, result in report['views'].items():
+            expected = baseline['views'].get(name)
+            if expected is None:
+                continue
+            for metric in COMPARED:
+                limit = expected[metric] * (1 + tolerance)
+                if result[metric] > limit:
+                    regressions.append(
+                        f'{name}: {metric} {result[metric]:.2f} мс, '
+                        f'базовое {expected[metric]:.2f} мс')
+            if result['queries'] > expected['queries']:
+                regressions.append(
+                    f'{name}: запросов {result["queries"]}, '
+                    f'базовое {expected["queries"]}')
+        if regressions:
+            raise CommandError(
+                'Замеры хуже базовых:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий относительно базовых замеров нет.')
@@ -0,0 +1,79 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, Follow, Group, Post
+
+from ._bulk import dump_dates
+
+CHUNK_SIZE = 2000
+
+QUERIES = (
+    ('group', Group, {
+        'slug': 'slug',
+        'title': 'title',
+        'description': 'description',
+        'updated_at': 'updated_at',
+    }),
+    ('post', Post, {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'image': 'image',
+        'pub_date': 'pub_date',
+        'updated_at': 'updated_at',
+    }),
+    ('comment', Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+        'updated_at': 'updated_at',
+    }),
+    ('follow', Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }),
+)
+
+
+class Command(BaseCommand):
+    help = ('Выгружает группы, посты, комментарии и подписки в JSONL. '
+            'Картинки не копируются, выгружаются только их имена.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл для выгрузки; по умолчанию stdout.')
+
+    def handle(self, *args, path, **options):
+        out = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8')
+        totals = {}
+        try:
+            for record_type, model, fields in QUERIES:
+                totals[record_type] = self.export(out, record_type, model,
+                                                  fields)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(self.style.SUCCESS('Выгружено: ' + ', '.join(
+            f'{record_type} {total}' for record_type, total in totals.items()
+        )))
+
+    def export(self, out, record_type, model, fields):
+        """Пишет записи одного типа, читая базу кусками по CHUNK_SIZE."""
+        names = list(fields)
+        rows = (
+            model.objects.order_by('pk')
+            .values_list(*fields.values())
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        total = 0
+        for row in rows:
+            record = dump_dates({'type': record_type, **dict(zip(names, row))})
+            out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            total += 1
+        return total
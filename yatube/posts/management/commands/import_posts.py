@@ -0,0 +1,187 @@
+import json
+import os
+from collections import defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts.caching import (INDEX_FEED, bump_generation, group_feed,
+                           profile_feed)
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post, User
+
+from ._bulk import RECORD_TYPES, explicit_dates, load_dates
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Загружает JSONL, выгруженный export_posts, пачками через '
+            'bulk_create, в базу без постов и комментариев. Прерванную '
+            'загрузку можно запустить снова: она продолжится с последней '
+            'сохранённой пачки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл JSONL.')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк сохранять одной транзакцией.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Начать с начала файла, не глядя на сохранённый прогресс.')
+
+    def handle(self, *args, path, batch_size, restart, **options):
+        checkpoint = path + '.checkpoint'
+        offset, lines = (0, 0) if restart else self.read_checkpoint(
+            checkpoint)
+        if lines:
+            self.stdout.write(f'Продолжаем после строки {lines}.')
+        elif Post.objects.exists() or Comment.objects.exists():
+            # id постов и комментариев берутся из файла: в непустой базе
+            # они совпали бы с чужими, и комментарии ушли бы к чужим постам.
+            raise CommandError(
+                'В базе уже есть посты или комментарии; загрузка возможна '
+                'только в пустую базу.')
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.changed_feeds = {INDEX_FEED}
+        batch = []
+        with open(path, 'rb') as source, \
+                explicit_dates(Group, Post, Comment):
+            source.seek(offset)
+            for line in source:
+                lines += 1
+                if line.strip():
+                    batch.append(self.parse(line, lines))
+                if len(batch) >= batch_size:
+                    self.save(batch, checkpoint, source.tell(), lines)
+                    batch = []
+            self.save(batch, checkpoint, source.tell(), lines)
+        self.finish()
+        os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(f'Загружено строк: {lines}.'))
+
+    def read_checkpoint(self, checkpoint):
+        """Смещение в файле и число строк, уже сохранённых в базе."""
+        if not os.path.exists(checkpoint):
+            return 0, 0
+        with open(checkpoint) as progress:
+            state = json.load(progress)
+        return state['offset'], state['lines']
+
+    def parse(self, line, number):
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+        if record.get('type') not in RECORD_TYPES:
+            raise CommandError(f'Строка {number}: неизвестный тип записи.')
+        return load_dates(record)
+
+    def save(self, batch, checkpoint, offset, lines):
+        """Сохраняет пачку одной транзакцией и запоминает прогресс.
+
+        Повтор пачки после сбоя безопасен: посты и комментарии сохраняют
+        свои id, а конфликты при вставке пропускаются.
+        """
+        by_type = defaultdict(list)
+        for record in batch:
+            by_type[record.pop('type')].append(record)
+        with transaction.atomic():
+            self.resolve_users(by_type)
+            self.save_groups(by_type['group'])
+            self.save_posts(by_type['post'])
+            self.save_comments(by_type['comment'])
+            self.save_follows(by_type['follow'])
+        with open(checkpoint, 'w') as progress:
+            json.dump({'offset': offset, 'lines': lines}, progress)
+        if batch:
+            self.stdout.write(f'Строк обработано: {lines}.')
+
+    def resolve_users(self, by_type):
+        """Дополняет карту авторов, создавая недостающих пользователей."""
+        usernames = {record['author'] for record in by_type['post']}
+        usernames.update(record['author'] for record in by_type['comment'])
+        for record in by_type['follow']:
+            usernames.update((record['user'], record['author']))
+        missing = usernames - self.users.keys()
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            (User(username=username, password=password)
+             for username in missing),
+            ignore_conflicts=True,
+        )
+        self.users.update(
+            User.objects.filter(username__in=missing)
+            .values_list('username', 'pk')
+        )
+
+    def save_groups(self, records):
+        if not records:
+            return
+        Group.objects.bulk_create(
+            (Group(**record) for record in records), ignore_conflicts=True)
+        slugs = [record['slug'] for record in records]
+        self.groups.update(
+            Group.objects.filter(slug__in=slugs).values_list('slug', 'pk'))
+
+    def save_posts(self, records):
+        posts = []
+        for record in records:
+            author_id = self.users[record['author']]
+            group_id = record['group'] and self.groups.get(record['group'])
+            if group_id is None and record['group']:
+                raise CommandError(
+                    f'Пост {record["id"]}: группы {record["group"]} '
+                    f'нет ни в файле, ни в базе.')
+            posts.append(Post(
+                id=record['id'],
+                author_id=author_id,
+                group_id=group_id,
+                text=record['text'],
+                image=record['image'],
+                pub_date=record['pub_date'],
+                updated_at=record['updated_at'] or record['pub_date'],
+            ))
+            self.changed_feeds.add(profile_feed(author_id))
+            if group_id:
+                self.changed_feeds.add(group_feed(group_id))
+        Post.objects.bulk_create(posts, ignore_conflicts=True)
+
+    def save_comments(self, records):
+        Comment.objects.bulk_create(
+            (Comment(
+                id=record['id'],
+                post_id=record['post'],
+                author_id=self.users[record['author']],
+                text=record['text'],
+                created=record['created'],
+                updated_at=record['updated_at'] or record['created'],
+            ) for record in records),
+            ignore_conflicts=True,
+        )
+
+    def save_follows(self, records):
+        Follow.objects.bulk_create(
+            (Follow(user_id=self.users[record['user']],
+                    author_id=self.users[record['author']])
+             for record in records
+             if record['user'] != record['author']),
+            ignore_conflicts=True,
+        )
+
+    def finish(self):
+        """Досчитывает то, что bulk_create обходит вместе с сигналами."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Post, Comment]):
+                cursor.execute(sql)
+        with transaction.atomic():
+            rebuild_counters()
+        call_command('rebuild_feeds', stdout=self.stdout)
+        bump_generation(*self.changed_feeds)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            timeline.rebuild_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {FeedEntry.objects.count()}.'))
@@ -0,0 +1,173 @@
+import random
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from faker import Faker
+
+from posts.caching import (INDEX_FEED, bump_generation, group_feed,
+                           profile_feed)
+from posts.counters import rebuild_counters
+from posts.models import Comment, Follow, Group, Post, User
+
+from ._bulk import explicit_dates
+
+BATCH_SIZE = 5000
+
+TEXT_POOL_SIZE = 500
+
+GROUP_SHARE = 0.7
+
+PERIOD = timedelta(days=365)
+
+USERNAME_PREFIX = 'bench'
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для benchmark_views: '
+            'пользователи, группы, посты, комментарии и подписки пачками '
+            'через bulk_create. Авторы и подписки распределены по Ципфу, '
+            'поэтому в данных есть и популярные, и случайные авторы.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк сохранять одним INSERT.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одинаковое зерно даёт одинаковые данные.')
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.random = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        self.texts = [
+            fake.paragraph(nb_sentences=3) for _ in range(TEXT_POOL_SIZE)]
+        self.now = timezone.now()
+        with explicit_dates(Group, Post, Comment):
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'], fake)
+            posts = self.create_posts(options['posts'], users, groups)
+            self.create_comments(options['comments'], users, posts)
+            self.create_follows(options['follows'], users)
+        with transaction.atomic():
+            rebuild_counters()
+        call_command('rebuild_feeds', stdout=self.stdout)
+        bump_generation(
+            INDEX_FEED,
+            *(group_feed(pk) for pk in groups),
+            *(profile_feed(pk) for pk in users),
+        )
+        self.stdout.write(self.style.SUCCESS('Данные для замеров готовы.'))
+
+    def insert(self, model, objects):
+        """Сохраняет объекты пачками; возвращает число отправленных строк."""
+        total = 0
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+        self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
+        return total
+
+    def new_pks(self, model, since):
+        return list(
+            model.objects.filter(pk__gt=since).order_by('pk')
+            .values_list('pk', flat=True))
+
+    def last_pk(self, model):
+        last = model.objects.order_by('-pk').values_list('pk').first()
+        return last[0] if last else 0
+
+    def zipf(self, population, count):
+        """count случайных элементов, где k-й встречается в k раз реже.
+
+        Выдаются порциями, чтобы не держать в памяти миллионы значений.
+        """
+        weights = list(accumulate(
+            1 / rank for rank in range(1, len(population) + 1)))
+        while count > 0:
+            size = min(count, self.batch_size)
+            yield from self.random.choices(
+                population, cum_weights=weights, k=size)
+            count -= size
+
+    def moment(self):
+        return self.now - timedelta(
+            seconds=self.random.randrange(int(PERIOD.total_seconds())))
+
+    def create_users(self, count):
+        since = self.last_pk(User)
+        password = make_password(USERNAME_PREFIX)
+        self.insert(User, (
+            User(username=f'{USERNAME_PREFIX}{since + number}',
+                 password=password, date_joined=self.now)
+            for number in range(1, count + 1)
+        ))
+        return self.new_pks(User, since)
+
+    def create_groups(self, count, fake):
+        since = self.last_pk(Group)
+        self.insert(Group, (
+            Group(title=fake.catch_phrase()[:200],
+                  slug=f'{USERNAME_PREFIX}-{since + number}',
+                  description=self.random.choice(self.texts),
+                  updated_at=self.now)
+            for number in range(1, count + 1)
+        ))
+        return self.new_pks(Group, since)
+
+    def create_posts(self, count, users, groups):
+        since = self.last_pk(Post)
+        authors = self.zipf(users, count)
+
+        def posts():
+            for author_id in authors:
+                pub_date = self.moment()
+                group_id = None
+                if groups and self.random.random() < GROUP_SHARE:
+                    group_id = self.random.choice(groups)
+                yield Post(author_id=author_id, group_id=group_id,
+                           text=self.random.choice(self.texts),
+                           pub_date=pub_date, updated_at=pub_date)
+
+        self.insert(Post, posts())
+        return self.new_pks(Post, since)
+
+    def create_comments(self, count, users, posts):
+        if not posts:
+            return
+
+        def comments():
+            for post_id in self.zipf(posts, count):
+                created = self.moment()
+                yield Comment(post_id=post_id,
+                              author_id=self.random.choice(users),
+                              text=self.random.choice(self.texts),
+                              created=created, updated_at=created)
+
+        self.insert(Comment, comments())
+
+    def create_follows(self, count, users):
+        """Подписки с повторами отбрасываются уникальным ограничением.
+
+        Подписки на себя удаляются после вставки одним запросом.
+        """
+        self.insert(Follow, (
+            Follow(user_id=self.random.choice(users), author_id=author_id)
+            for author_id in self.zipf(users, count)
+        ))
+        Follow.objects.filter(user=F('author')).delete()
@@ -0,0 +1,95 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .caching import PAGE_PARAMS, get_generations
+
+PAGE_CACHE_TIMEOUT = 60 * 10
+
+CACHED_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+)
+
+
+class AnonymousPageCacheMiddleware:
+    """Кэш целых страниц лент и постов для анонимных читателей.
+
+    Стоит до сессий и аутентификации, поэтому попадание в кэш не
+    трогает ни базу, ни шаблоны. Запросы с кукой сессии, CSRF или
+    сообщений идут мимо кэша. Вместе со страницей хранятся поколения
+    лент, которые она показывает (их запоминает ETag вьюхи); страница
+    отдаётся, только пока ни одна из этих лент не сдвинулась.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = self.cache_key(request)
+        if key is None:
+            return self.get_response(request)
+        response = self.cached_response(key)
+        if response is not None:
+            response['X-Page-Cache'] = 'hit'
+            return get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified')),
+                response=response,
+            )
+        response = self.get_response(request)
+        generations = getattr(request, 'page_generations', None)
+        if generations is not None and self.can_store(response):
+            cache.set(key, (response, generations), PAGE_CACHE_TIMEOUT)
+        return response
+
+    def cached_response(self, key):
+        """Страница из кэша, если поколения её лент не сдвинулись."""
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        response, generations = entry
+        if get_generations(*generations) != list(generations.values()):
+            return None
+        return response
+
+    def cache_key(self, request):
+        if request.method != 'GET':
+            return None
+        cookies = (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME,
+                   CookieStorage.cookie_name)
+        if any(cookie in request.COOKIES for cookie in cookies):
+            return None
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if match.view_name not in CACHED_VIEWS:
+            return None
+        # Попадания в кэш минуют разбор адреса, а метрикам нужна вьюха.
+        request.resolver_match = match
+        params = '&'.join(
+            f'{param}={request.GET[param]}'
+            for param in PAGE_PARAMS if param in request.GET
+        )
+        digest = md5(f'{request.path}?{params}'.encode()).hexdigest()
+        return f'page:{digest}'
+
+    def can_store(self, response):
+        """Сохраняются только общие для всех ответы без новых кук."""
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and 'private' not in response.get('Cache-Control', '')
+        )
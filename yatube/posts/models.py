@@ -1,15 +1,34 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа подгружаются одним запросом."""
+        return self.select_related('author', 'group')
+
+    def for_detail(self):
+        """Пост для отдельной страницы вместе со счётчиками автора."""
+        return self.select_related('author__counters', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_detail(self):
+        """Комментарии к посту вместе с авторами."""
+        return self.select_related('author')
+
+
 class Group(models.Model):
     """Модель групп."""
 
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
 
     def __str__(self):
         return self.title
@@ -18,8 +37,16 @@ class Group(models.Model):
 class Post(models.Model):
     """Модель постов."""
 
+    objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = (
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
@@ -52,13 +79,28 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
 
 
 class Comment(models.Model):
     """Модель комментариев."""
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created']
+        indexes = (
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_created_idx'),
+        )
 
     post = models.ForeignKey(
         Post,
@@ -79,6 +121,10 @@ class Comment(models.Model):
         verbose_name='Дата комментария',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
 
     def __str__(self):
         return self.text[:15]
@@ -93,6 +139,10 @@ class Follow(models.Model):
         ordering = ('author',)
         constraints = (models.UniqueConstraint(
             fields=['author', 'user'], name='unique_follow'),)
+        indexes = (
+            models.Index(fields=['user', 'author'],
+                         name='follow_user_author_idx'),
+        )
 
     user = models.ForeignKey(
         User,
@@ -106,3 +156,88 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date', '-post_id')
+        constraints = (models.UniqueConstraint(
+            fields=['user', 'post'], name='unique_feed_entry'),)
+        indexes = (
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='feed_user_author_idx'),
+        )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+
+class UserCountersManager(models.Manager):
+    def change(self, user_id, **deltas):
+        """Атомарно сдвигает счётчики пользователя на заданные величины."""
+        values = {
+            field: F(field) + delta if delta > 0
+            else Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()
+        }
+        if self.filter(user_id=user_id).update(**values):
+            return
+        if all(delta < 0 for delta in deltas.values()):
+            # Уменьшать нечего; к тому же строки может не быть, потому что
+            # пользователь удаляется каскадом вместе со счётчиками.
+            return
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id)
+        except IntegrityError:
+            pass
+        self.filter(user_id=user_id).update(**values)
+
+
+class UserCounters(models.Model):
+    """Денормализованные счётчики пользователя."""
+
+    objects = UserCountersManager()
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+        indexes = (
+            models.Index(fields=['followers_count'],
+                         name='counters_followers_idx'),
+        )
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
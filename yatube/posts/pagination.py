@@ -1,10 +1,157 @@
+import base64
+import binascii
+from collections.abc import Sequence
+
+from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
+from django.db.models import Q
 
 POSTS_PER_PAGE = 10
 
+CURSOR_PARAMS = ('after', 'before')
+
+POST_ORDERING = ('pub_date', 'id')
+
+COMMENTS_PER_PAGE = 20
+
+COMMENT_ORDERING = ('created', 'id')
+
+# Целые вне 64-битного диапазона база не принимает в параметрах.
+INTEGER_RANGE = range(-2 ** 63, 2 ** 63)
 
-def get_page(request, objects):
+
+def get_page(request, objects, ordering=POST_ORDERING):
+    """Страница ленты: по номеру (?page=) или по курсору (?after=/?before=).
+
+    Курсорный режим включается наличием параметра after или before,
+    пустое значение означает первую страницу.
+    """
+    if any(param in request.GET for param in CURSOR_PARAMS):
+        return get_cursor_page(request, objects, ordering)
     paginator = Paginator(objects, POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def _cursor_part(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _columns(model, ordering):
+    """Поля сортировки как столбцы: внешний ключ сортируется по id,
+    а не по сортировке связанной модели."""
+    return [model._meta.get_field(field).attname for field in ordering]
+
+
+def encode_cursor(obj, ordering=POST_ORDERING):
+    raw = '|'.join(
+        _cursor_part(getattr(obj, column))
+        for column in _columns(obj, ordering))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, ordering=POST_ORDERING):
+    """Значения полей курсора или None, если токен испорчен."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        parts = raw.decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if len(parts) != len(ordering):
+        return None
+    try:
+        values = [
+            model._meta.get_field(field).to_python(part)
+            for field, part in zip(ordering, parts)
+        ]
+    except (ValidationError, OverflowError):
+        return None
+    if any(isinstance(value, int) and value not in INTEGER_RANGE
+           for value in values):
+        return None
+    return values
+
+
+def keyset_filter(ordering, values, lookup):
+    """Условие «строго после курсора» для составного ключа сортировки.
+
+    Первое поле дополнительно ограничено нестрогим сравнением, чтобы
+    база могла начать чтение индекса прямо с позиции курсора.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        step = Q(**{f'{field}__{lookup}': values[position]})
+        for prev_field, prev_value in zip(ordering[:position], values):
+            step &= Q(**{prev_field: prev_value})
+        condition |= step
+    return Q(**{f'{ordering[0]}__{lookup}e': values[0]}) & condition
+
+
+class CursorPage(Sequence):
+    """Страница ленты, выбранная по курсору без COUNT(*) и OFFSET.
+
+    Курсоры вычисляются при создании страницы, поэтому object_list
+    можно заменить, например, постами вместо записей ленты.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _make_cursor_page(rows, has_next, has_previous, ordering):
+    next_cursor = previous_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(rows[-1], ordering)
+    if rows and has_previous:
+        previous_cursor = encode_cursor(rows[0], ordering)
+    return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def get_cursor_page(request, objects, ordering=POST_ORDERING,
+                    per_page=POSTS_PER_PAGE):
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    model = objects.model
+    columns = _columns(model, ordering)
+    newest_first = [f'-{column}' for column in columns]
+    if before:
+        values = decode_cursor(before, model, ordering)
+        if values is not None:
+            rows = list(
+                objects.filter(keyset_filter(columns, values, 'gt'))
+                .order_by(*columns)[:per_page + 1]
+            )
+            has_previous = len(rows) > per_page
+            return _make_cursor_page(
+                rows[:per_page][::-1], True, has_previous, ordering)
+    values = decode_cursor(after, model, ordering) if after else None
+    if values is not None:
+        objects = objects.filter(keyset_filter(columns, values, 'lt'))
+    rows = list(objects.order_by(*newest_first)[:per_page + 1])
+    return _make_cursor_page(
+        rows[:per_page], len(rows) > per_page, values is not None, ordering)
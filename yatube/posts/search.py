@@ -0,0 +1,130 @@
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+
+FTS_TRIGGERS = (
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END''',
+)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def install_fts(using='default'):
+    """Создаёт индекс FTS5 по тексту постов и триггеры синхронизации.
+
+    Вызывается после каждой миграции: SQLite пересоздаёт таблицу
+    posts_post при изменении схемы, и триггеры при этом теряются.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [FTS_TABLE],
+        )
+        created = cursor.fetchone() is None
+        if created:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "text, content='posts_post', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+        for trigger in FTS_TRIGGERS:
+            cursor.execute(trigger)
+        if created:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uses_fts(using='default'):
+    return connections[using].vendor == 'sqlite'
+
+
+def to_match(query):
+    """Запрос FTS5 из пользовательского ввода: все слова, по префиксу."""
+    words = WORD_RE.findall(query.lower())
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def filter_posts(queryset, query):
+    """Посты queryset, подходящие под запрос, без учёта релевантности."""
+    match = to_match(query)
+    if not match:
+        return queryset.none()
+    if not uses_fts(queryset.db):
+        return queryset.filter(text__icontains=query)
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match],
+    ))
+
+
+class SearchResults:
+    """Найденные посты в порядке релевантности.
+
+    Поддерживает count() и срезы, поэтому отдаётся в Paginator как
+    обычный queryset; каждый срез — один запрос к индексу и один к постам.
+    """
+
+    def __init__(self, query):
+        self.match = to_match(query)
+
+    def _fetch(self, sql, params):
+        with connections[router.db_for_read(Post)].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if not self.match:
+            return 0
+        rows = self._fetch(
+            f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [self.match],
+        )
+        return rows[0][0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if not self.match:
+            return []
+        start = index.start or 0
+        rows = self._fetch(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            'ORDER BY rank LIMIT %s OFFSET %s',
+            [self.match, index.stop - start, start],
+        )
+        ids = [row[0] for row in rows]
+        posts = Post.objects.for_feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    """Результаты поиска для пагинации: FTS5 на SQLite, LIKE на прочих."""
+    if uses_fts():
+        return SearchResults(query)
+    return filter_posts(Post.objects.for_feed(), query)
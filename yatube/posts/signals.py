@@ -0,0 +1,227 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import search, timeline
+from .caching import (INDEX_FEED, bump_generation, follow_feed, group_feed,
+                      post_feed, post_feeds, profile_feed, slug_feed,
+                      username_feed)
+from .models import Comment, Follow, Group, Post, User, UserCounters
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    """Запоминает прежнюю группу, чтобы сбросить кэш и её ленты."""
+    instance._previous_group_id = None
+    if instance.pk is not None:
+        instance._previous_group_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, **kwargs):
+    previous_group_id = getattr(instance, '_previous_group_id', None)
+    bump_generation(*post_feeds(instance, previous_group_id))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, **kwargs):
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        bump_generation(*post_feeds(post))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    bump_generation(
+        follow_feed(instance.user_id), profile_feed(instance.author_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, created=False, **kwargs):
+    """Сбрасывает ленты, где показываются ссылки на группу.
+
+    При удалении срабатывает до того, как у постов обнулится группа,
+    иначе их авторов уже не найти.
+    """
+    if created:
+        return
+    authors = (
+        Post.objects.filter(group=instance)
+        .values_list('author_id', flat=True).distinct()
+    )
+    bump_generation(
+        INDEX_FEED,
+        group_feed(instance.pk),
+        *(profile_feed(author_id) for author_id in authors),
+    )
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    instance._previous_slug = None
+    if instance.pk is not None:
+        instance._previous_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_slug(sender, instance, created, **kwargs):
+    """Сбрасывает страницы адреса группы, когда он ведёт к другой группе.
+
+    Закэшированная страница проверяется по лентам прежней группы и
+    не знает, что slug теперь занят новой.
+    """
+    previous = getattr(instance, '_previous_slug', None)
+    if created:
+        bump_generation(slug_feed(instance.slug))
+    elif previous is not None and previous != instance.slug:
+        bump_generation(slug_feed(previous), slug_feed(instance.slug))
+
+
+@receiver(post_delete, sender=Group)
+def release_group_slug(sender, instance, **kwargs):
+    bump_generation(slug_feed(instance.slug))
+
+
+@receiver(pre_save, sender=User)
+def remember_user_name(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнее имя, чтобы после переименования сбросить ленты.
+
+    Сохранения без полей имени, например last_login при входе, базу
+    не трогают.
+    """
+    instance._previous_name = None
+    if instance.pk is None or (
+            update_fields is not None
+            and not set(update_fields) & set(NAME_FIELDS)):
+        return
+    instance._previous_name = (
+        User.objects.filter(pk=instance.pk).values_list(*NAME_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_feeds(sender, instance, created, **kwargs):
+    """Сбрасывает ленты, где показывается имя переименованного автора."""
+    previous = getattr(instance, '_previous_name', None)
+    current = tuple(getattr(instance, field) for field in NAME_FIELDS)
+    if created or previous is None or previous == current:
+        return
+    groups = (
+        Post.objects.filter(author=instance).exclude(group=None)
+        .values_list('group_id', flat=True).distinct()
+    )
+    followers = Follow.objects.filter(author=instance).values_list(
+        'user_id', flat=True)
+    # Имя комментатора показывается на страницах чужих постов.
+    commented = (
+        Comment.objects.filter(author=instance)
+        .values_list('post_id', flat=True).distinct()
+    )
+    bump_generation(
+        INDEX_FEED,
+        profile_feed(instance.pk),
+        *(group_feed(group_id) for group_id in groups),
+        *(follow_feed(user_id) for user_id in followers),
+        *(post_feed(post_id) for post_id in commented),
+    )
+
+
+@receiver(post_save, sender=User)
+def invalidate_username(sender, instance, created, **kwargs):
+    """Сбрасывает страницы профиля, когда имя занял другой пользователь."""
+    previous = getattr(instance, '_previous_name', None)
+    if created:
+        bump_generation(username_feed(instance.username))
+    elif previous is not None and previous[0] != instance.username:
+        bump_generation(
+            username_feed(previous[0]), username_feed(instance.username))
+
+
+@receiver(post_delete, sender=User)
+def release_username(sender, instance, **kwargs):
+    bump_generation(username_feed(instance.username))
+
+
+@receiver(post_save, sender=User)
+def create_user_counters(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.change(instance.author_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    UserCounters.objects.change(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            updated_at=timezone.now(),
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        UserCounters.objects.change(instance.author_id, followers_count=1)
+        UserCounters.objects.change(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    UserCounters.objects.change(instance.author_id, followers_count=-1)
+    UserCounters.objects.change(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        timeline.backfill(instance.user, instance.author)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_unfollowed_feed(sender, instance, **kwargs):
+    timeline.remove(instance.user_id, instance.author_id)
+
+
+@receiver(post_migrate)
+def install_post_search(sender, using, **kwargs):
+    if sender.name == 'posts':
+        search.install_fts(using)
@@ -0,0 +1,90 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import F
+from django.test import TestCase
+
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserCounters
+
+
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.output = os.path.join(cls.dir, 'benchmark.json')
+        cls.baseline = os.path.join(cls.dir, 'baseline.json')
+        call_command(
+            'seed_benchmark', users=20, groups=3, posts=200, comments=100,
+            follows=60, batch_size=50, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def run_benchmark(self, *args):
+        call_command('benchmark_views', '--requests', '3',
+                     '--output', self.output, *args, stdout=StringIO())
+        with open(self.output) as output:
+            return json.load(output)
+
+    def write_baseline(self, views):
+        with open(self.baseline, 'w') as baseline:
+            json.dump({'cold': False, 'views': views}, baseline)
+
+    def test_seed_creates_consistent_dataset(self):
+        """Данные создаются пачками вместе со счётчиками и лентами."""
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(UserCounters.objects.count(), 20)
+        self.assertEqual(
+            sum(UserCounters.objects.values_list('posts_count', flat=True)),
+            200)
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_benchmark_reports_percentiles_and_queries(self):
+        """Отчёт содержит перцентили и число запросов каждой страницы."""
+        report = self.run_benchmark()
+        self.assertEqual(report['dataset']['post'], 200)
+        for name in ('index', 'group_list', 'profile', 'post_detail',
+                     'follow_index'):
+            with self.subTest(view=name):
+                result = report['views'][name]
+                self.assertLessEqual(result['p50'], result['p95'])
+                self.assertLessEqual(result['p95'], result['p99'])
+                self.assertGreater(result['queries'], 0)
+
+    def test_regression_against_baseline_fails(self):
+        """Рост времени или числа запросов против базовых — ошибка."""
+        views = self.run_benchmark()['views']
+        self.write_baseline(views)
+        self.run_benchmark('--baseline', self.baseline, '--tolerance', '100')
+        self.write_baseline({
+            name: dict(result, queries=0) for name, result in views.items()})
+        with self.assertRaisesMessage(CommandError, 'запросов'):
+            self.run_benchmark(
+                '--baseline', self.baseline, '--tolerance', '100')
+
+    def test_bench_post_cards_with_few_repeats(self):
+        """Замер карточек работает и на единичных повторах."""
+        for repeat in (1, 3):
+            with self.subTest(repeat=repeat):
+                stdout = StringIO()
+                call_command('bench_post_cards', repeat=repeat,
+                             stdout=stdout)
+                self.assertIn('p95', stdout.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('bench_post_cards', repeat=0, stdout=StringIO())
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counter(self):
+        """Создание и удаление поста меняет счётчик автора."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(self.counters(self.author).posts_count, 1)
+        post.delete()
+        self.assertEqual(self.counters(self.author).posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии считаются в посте."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.counters(self.author).followers_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_user_with_posts_and_follows_can_be_deleted(self):
+        """Каскадное удаление пользователя не пересоздаёт его счётчики."""
+        user = User.objects.create_user(username='Leaving')
+        Post.objects.create(author=user, text='Пост')
+        Follow.objects.create(user=user, author=self.author)
+        Follow.objects.create(user=self.reader, author=user)
+        user.delete()
+        self.assertFalse(UserCounters.objects.filter(user_id=user.pk).exists())
+        self.assertEqual(self.counters(self.author).followers_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_rebuild_counters(self):
+        """Команда rebuild_counters восстанавливает счётчики."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Post.objects.bulk_create(
+            Post(author=self.author, text='Без сигналов') for _ in range(2))
+        Comment.objects.bulk_create(
+            [Comment(post=post, author=self.reader, text='Без сигналов')])
+        UserCounters.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.counters(self.author).posts_count, 3)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_rebuild_counters_for_many_users(self):
+        """Счётчики создаются и для сотен пользователей без них."""
+        User.objects.bulk_create(
+            User(username=f'Bulk{num}') for num in range(600))
+        UserCounters.objects.all().delete()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(UserCounters.objects.count(), User.objects.count())
+
+    def test_profile_reads_stored_counts(self):
+        """Профиль показывает счётчики без COUNT(*) по постам автора."""
+        Post.objects.create(author=self.author, text='Пост')
+        UserCounters.objects.filter(user=self.author).update(posts_count=42)
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': self.author}))
+        self.assertContains(response, 'Всего постов: 42')
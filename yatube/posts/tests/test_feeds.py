@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SyndicationFeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Syndicated')
+        cls.group = Group.objects.create(
+            title='Лента группы', slug='syndicated', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост для читалок')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def feed_urls(self):
+        """Адрес ленты, её тип и число запросов при попадании в кэш."""
+        group, author = (self.group.slug,), (self.author.username,)
+        rss, atom = 'application/rss+xml', 'application/atom+xml'
+        return (
+            (reverse('posts:index_rss'), rss, 0),
+            (reverse('posts:index_atom'), atom, 0),
+            (reverse('posts:group_rss', args=group), rss, 1),
+            (reverse('posts:group_atom', args=group), atom, 1),
+            (reverse('posts:profile_rss', args=author), rss, 1),
+            (reverse('posts:profile_atom', args=author), atom, 1),
+        )
+
+    def test_feeds_list_posts(self):
+        """Ленты отдают посты в своём формате."""
+        for url, content_type, _ in self.feed_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type))
+                self.assertContains(response, self.post.text)
+
+    def test_feeds_are_cached_and_revalidated(self):
+        """Повторный опрос отдаётся из кэша, а с ETag получает 304."""
+        for url, _, lookups in self.feed_urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(lookups):
+                    self.assertEqual(
+                        self.client.get(url).content, response.content)
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(not_modified.status_code, 304)
+
+    def test_new_post_changes_feeds(self):
+        """Новый пост сразу попадает в закэшированные ленты."""
+        urls = [url for url, _, _ in self.feed_urls()]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежая запись')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Свежая запись')
+
+    def test_scheme_is_part_of_key(self):
+        """Лента со ссылками http не отдаётся читалкам по https."""
+        url = reverse('posts:index_rss')
+        plain = self.client.get(url)
+        secure = self.client.get(url, secure=True)
+        self.assertNotEqual(plain['ETag'], secure['ETag'])
+        self.assertContains(secure, 'https://')
+        self.assertNotContains(plain, 'https://')
+
+    def test_missing_feed_is_not_found(self):
+        """Лента несуществующей группы или автора отвечает 404."""
+        for url in (reverse('posts:group_rss', args=('missing',)),
+                    reverse('posts:profile_atom', args=('missing',))):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -1,13 +1,30 @@
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import uploads
 from ..forms import PostForm
 from ..models import Comment, Group, Post
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 User = get_user_model()
 
 
+def make_image(fmt, size=(40, 20), mode='RGB', color='red', **save_options):
+    buffer = BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt, **save_options)
+    return buffer.getvalue()
+
+
 class FormsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -98,3 +115,69 @@ class FormsTests(TestCase):
             response,
             f'/auth/login/?next=/posts/{self.post.pk}/comment/'
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def upload(self, name, content):
+        return self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(name, content),
+        })
+
+    def test_original_is_normalized(self):
+        """Оригинал уменьшается, поворачивается и теряет EXIF."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        content = make_image('JPEG', size=(3000, 1000), exif=exif)
+        with mock.patch.object(uploads, 'MASTER_SIZE', (600, 600)):
+            self.upload('camera.jpeg', content)
+        post = Post.objects.get(author=self.author)
+        self.assertEqual(post.image.name, 'posts/camera.jpg')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (200, 600))
+            self.assertNotIn('exif', stored.info)
+
+    def test_transparency_is_kept_as_png(self):
+        """Картинка с прозрачностью сохраняется в PNG."""
+        content = make_image('WEBP', mode='RGBA', color=(255, 0, 0, 0))
+        self.upload('logo.webp', content)
+        post = Post.objects.get(author=self.author)
+        self.assertEqual(post.image.name, 'posts/logo.png')
+
+    def assertRejected(self, name, content):
+        response = self.upload(name, content)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+
+    def test_limits(self):
+        """Файлы больше лимита по байтам или пикселям отклоняются."""
+        for limit, value in (('MAX_UPLOAD_BYTES', 10), ('MAX_PIXELS', 100)):
+            with self.subTest(limit=limit):
+                with mock.patch.object(uploads, limit, value):
+                    self.assertRejected('big.png', make_image('PNG'))
+
+    def test_unsupported_format(self):
+        """Форматы, кроме JPEG, PNG, GIF и WebP, отклоняются."""
+        self.assertRejected('old.bmp', make_image('BMP'))
+
+    def test_truncated_image(self):
+        """Обрезанный файл с целым заголовком отклоняется без ошибки."""
+        content = make_image('JPEG', size=(400, 400), color='blue')
+        self.assertRejected('broken.jpg', content[:len(content) // 2])
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..management.commands import import_posts
+from ..models import Comment, FeedEntry, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class ImportExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.path = os.path.join(cls.dir, 'posts.jsonl')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.dir, ignore_errors=True)
+
+    def setUp(self):
+        author = User.objects.create_user(username='Writer')
+        reader = User.objects.create_user(username='Reader')
+        group = Group.objects.create(
+            title='Группа', slug='export', description='Описание')
+        self.posts = [
+            Post.objects.create(
+                author=author, text=f'Пост {num}',
+                group=group if num % 2 else None)
+            for num in range(5)
+        ]
+        Comment.objects.create(
+            post=self.posts[0], author=reader, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+        call_command('export_posts', self.path, stderr=StringIO())
+        self.snapshot = self.dump()
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+
+    def dump(self):
+        return {
+            'posts': list(Post.objects.order_by('pk').values_list(
+                'pk', 'author__username', 'group__slug', 'text', 'pub_date',
+                'comments_count')),
+            'comments': list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'text', 'created')),
+            'follows': list(Follow.objects.values_list(
+                'user__username', 'author__username')),
+            'counters': sorted(UserCounters.objects.values_list(
+                'user__username', 'posts_count', 'followers_count',
+                'following_count')),
+            'feed': FeedEntry.objects.count(),
+        }
+
+    def load(self, **options):
+        call_command('import_posts', self.path, stdout=StringIO(), **options)
+
+    def test_export_is_jsonl_in_dependency_order(self):
+        """Выгрузка — по записи на строку, группы раньше постов."""
+        with open(self.path, encoding='utf-8') as source:
+            types = [json.loads(line)['type'] for line in source]
+        self.assertEqual(
+            types, ['group'] + ['post'] * 5 + ['comment', 'follow'])
+
+    def test_round_trip(self):
+        """Загрузка восстанавливает данные, даты, счётчики и ленты."""
+        self.load()
+        self.assertEqual(self.dump(), self.snapshot)
+        self.assertFalse(os.path.exists(self.path + '.checkpoint'))
+
+    def test_interrupted_import_resumes(self):
+        """Прерванная загрузка продолжается без дублей."""
+        save_comments = import_posts.Command.save_comments
+
+        def crash(command, records):
+            if records:
+                raise RuntimeError
+            save_comments(command, records)
+
+        with mock.patch.object(import_posts.Command, 'save_comments',
+                               autospec=True, side_effect=crash):
+            with self.assertRaises(RuntimeError):
+                self.load(batch_size=2)
+        self.assertTrue(os.path.exists(self.path + '.checkpoint'))
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertFalse(Comment.objects.exists())
+        self.load(batch_size=2)
+        self.assertEqual(self.dump(), self.snapshot)
+
+    def test_import_refuses_non_empty_database(self):
+        """В базу с постами файл не загружается: id совпали бы с чужими."""
+        Post.objects.create(
+            author=User.objects.create_user(username='Local'), text='Свой')
+        with self.assertRaises(CommandError):
+            self.load()
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Comment.objects.exists())
+
+    def test_unknown_group_is_reported(self):
+        """Пост с неизвестной группой останавливает загрузку с ошибкой."""
+        with open(self.path, encoding='utf-8') as source:
+            lines = [json.loads(line) for line in source]
+        with open(self.path, 'w', encoding='utf-8') as target:
+            for record in lines:
+                if record['type'] != 'group':
+                    target.write(json.dumps(record) + '\n')
+        with self.assertRaisesMessage(CommandError, 'export'):
+            self.load()
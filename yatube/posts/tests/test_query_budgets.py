@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.budgets import url_budgets
+from core.testing import QueryBudgetMixin
+
+from .. import urls
+from ..models import Comment, Follow, Group, Post
+from .test_thumbnails import SMALL_GIF
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Budget')
+        cls.other = User.objects.create_user(username='Other')
+        cls.stranger = User.objects.create_user(username='Stranger')
+        cls.group = Group.objects.create(
+            title='Бюджеты', slug='budgets', description='Описание')
+        Follow.objects.create(user=cls.author, author=cls.other)
+        Follow.objects.create(user=cls.author, author=cls.stranger)
+        for number in range(12):
+            for user in (cls.author, cls.other, cls.stranger):
+                Post.objects.create(
+                    author=user, group=cls.group, text=f'Пост {number}')
+        # Посты с картинками, в том числе в ленте подписок: бюджеты
+        # лент и страницы поста учитывают поиск миниатюр в kvstore.
+        pictured = [
+            Post.objects.create(
+                author=user, group=cls.group, text='Пост с картинкой',
+                image=SimpleUploadedFile(
+                    f'budget-{user.pk}.gif', SMALL_GIF, 'image/gif'))
+            for user in (cls.author, cls.other)
+        ]
+        cls.post = pictured[0]
+        for user in (cls.author, cls.other, cls.stranger) * 2:
+            Comment.objects.create(post=cls.post, author=user, text='Ответ')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def view_requests(self):
+        """Запрос к каждому маршруту posts.urls: метод, адрес, данные."""
+        group, author = (self.group.slug,), (self.author.username,)
+        post = (self.post.pk,)
+        return {
+            'index': ('get', reverse('posts:index'), None),
+            'index_rss': ('get', reverse('posts:index_rss'), None),
+            'index_atom': ('get', reverse('posts:index_atom'), None),
+            'group_list': (
+                'get', reverse('posts:group_list', args=group), None),
+            'group_rss': ('get', reverse('posts:group_rss', args=group), None),
+            'group_atom': (
+                'get', reverse('posts:group_atom', args=group), None),
+            'profile': ('get', reverse('posts:profile', args=author), None),
+            'profile_rss': (
+                'get', reverse('posts:profile_rss', args=author), None),
+            'profile_atom': (
+                'get', reverse('posts:profile_atom', args=author), None),
+            'search': ('get', reverse('posts:search'), {'q': 'Пост'}),
+            'post_detail': (
+                'get', reverse('posts:post_detail', args=post), None),
+            'post_comments': (
+                'get', reverse('posts:post_comments', args=post), None),
+            'post_create': ('get', reverse('posts:post_create'), None),
+            'post_edit': ('get', reverse('posts:post_edit', args=post), None),
+            'add_comment': (
+                'post', reverse('posts:add_comment', args=post),
+                {'text': 'Новый ответ'}),
+            'follow_index': ('get', reverse('posts:follow_index'), None),
+            'profile_follow': (
+                'get', reverse('posts:profile_follow',
+                               args=(self.other.username,)), None),
+            'profile_unfollow': (
+                'get', reverse('posts:profile_unfollow',
+                               args=(self.stranger.username,)), None),
+        }
+
+    def test_every_view_has_budget(self):
+        """У каждой вьюхи posts.urls есть бюджет и запрос в этом тесте."""
+        budgets = url_budgets(urls)
+        self.assertEqual(set(budgets), set(self.view_requests()))
+        for name, budget in budgets.items():
+            with self.subTest(view=name):
+                self.assertIsNotNone(budget)
+
+    def test_views_stay_within_budget(self):
+        """Вьюхи на холодном кэше укладываются в свой бюджет запросов."""
+        budgets = url_budgets(urls)
+        for name, (method, url, data) in self.view_requests().items():
+            with self.subTest(view=name):
+                cache.clear()
+                response = self.assertWithinBudget(
+                    budgets[name], getattr(self.client, method), url, data)
+                self.assertIn(response.status_code, (200, 302))
@@ -0,0 +1,110 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+from ..timeline import FANOUT_FOLLOWERS_LIMIT
+
+User = get_user_model()
+
+TABLE_SCAN_RE = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+def query_plan(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def bad_steps(plan, allow_sort=False):
+    """Шаги плана с полным просмотром таблицы или сортировкой в памяти."""
+    return [
+        step for step in plan
+        if TABLE_SCAN_RE.match(step)
+        or (TEMP_SORT in step and not allow_sort)
+    ]
+
+
+@skipUnless(connection.vendor == 'sqlite',
+            'EXPLAIN QUERY PLAN есть только в SQLite')
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Planner')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Планы', slug='plans', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(15)
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост с комментариями')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.reader, text=f'Ответ {number}')
+            for number in range(25)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def view_urls(self):
+        group, author = (self.group.slug,), (self.author.username,)
+        post = (self.post.pk,)
+        return (
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:index') + '?after=',
+            reverse('posts:group_list', args=group),
+            reverse('posts:group_list', args=group) + '?page=2',
+            reverse('posts:group_list', args=group) + '?after=',
+            reverse('posts:profile', args=author),
+            reverse('posts:profile', args=author) + '?page=2',
+            reverse('posts:profile', args=author) + '?after=',
+            reverse('posts:follow_index'),
+            reverse('posts:follow_index') + '?after=',
+            reverse('posts:post_detail', args=post),
+            reverse('posts:post_comments', args=post),
+        )
+
+    def assertIndexedQueries(self, url, allow_sort=False):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            plan = query_plan(sql)
+            self.assertEqual(bad_steps(plan, allow_sort), [], f'{sql}\n{plan}')
+
+    def test_view_queries_use_indexes(self):
+        """Запросы страниц идут по индексам, без сортировки в памяти."""
+        for url in self.view_urls():
+            with self.subTest(url=url):
+                self.assertIndexedQueries(url)
+
+    def test_pulled_follow_feed_uses_indexes(self):
+        """Лента с постами популярного автора не просматривает таблицы.
+
+        Записи ленты и посты популярных авторов объединяются через OR,
+        такой запрос SQLite не может отдать в порядке индекса, поэтому
+        сортировка здесь допустима.
+        """
+        UserCounters.objects.filter(user=self.author).update(
+            followers_count=FANOUT_FOLLOWERS_LIMIT + 1)
+        for url in (reverse('posts:follow_index'),
+                    reverse('posts:follow_index') + '?after='):
+            with self.subTest(url=url):
+                self.assertIndexedQueries(url, allow_sort=True)
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Post
+from ..search import filter_posts, to_match
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Searcher')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Ёжики гуляют в тумане')
+        cls.other = Post.objects.create(
+            author=cls.user, text='Совсем другой текст')
+
+    def search(self, query):
+        response = Client().get(reverse('posts:search'), {'q': query})
+        return list(response.context['page_obj'])
+
+    def test_search_finds_posts(self):
+        """Поиск находит пост по слову и по началу слова."""
+        self.assertEqual(self.search('тумане'), [self.post])
+        self.assertEqual(self.search('гуля'), [self.post])
+        self.assertEqual(self.search('несуществующее'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        Post.objects.filter(pk=self.other.pk).update(text='Про туман')
+        self.assertCountEqual(self.search('туман'), [self.post, self.other])
+        self.assertEqual(self.search('про'), [self.other])
+        self.other.delete()
+        self.assertEqual(self.search('про'), [])
+
+    def test_query_is_escaped(self):
+        """Служебный синтаксис FTS5 в запросе не ломает поиск."""
+        self.assertEqual(to_match('a" OR b*'), '"a"* "or"* "b"*')
+        self.assertEqual(self.search('"NEAR('), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует полнотекстовый индекс."""
+        queryset, may_have_duplicates = PostAdmin(
+            Post, None).get_search_results(None, Post.objects.all(), 'ёжики')
+        self.assertEqual(list(queryset), [self.post])
+        self.assertFalse(may_have_duplicates)
+        self.assertEqual(
+            list(filter_posts(Post.objects.all(), '   ')), [])
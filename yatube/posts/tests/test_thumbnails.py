@@ -0,0 +1,140 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='Photographer')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def generate_set(self, post, image_set='feed'):
+        return {
+            (width, fmt): thumbnails.generate(post.image, variant)
+            for width, fmt, variant in thumbnails.set_variants(image_set)
+        }
+
+    def test_feed_does_not_block_on_thumbnail(self):
+        """Лента отдаёт оригинал, пока миниатюры нет, и ставит задание."""
+        callbacks = len(connection.run_on_commit)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, self.post.image.url)
+        self.assertIsNone(thumbnails.lookup(self.post.image, 'feed-960-jpeg'))
+        self.assertGreater(len(connection.run_on_commit), callbacks)
+
+    def test_ready_thumbnail_is_used(self):
+        """Готовая миниатюра попадает в ленту."""
+        expected = thumbnails.generate(self.post.image, 'feed-960-jpeg')
+        self.assertEqual(
+            thumbnails.lookup(self.post.image, 'feed-960-jpeg').name,
+            expected.name,
+        )
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, expected.url)
+
+    def test_variant_names_match_sorl(self):
+        """Имя варианта совпадает с тем, что создаёт sorl-thumbnail."""
+        for variant in thumbnails.VARIANTS:
+            with self.subTest(variant=variant):
+                self.assertEqual(
+                    thumbnails.thumbnail_file(self.post.image, variant).name,
+                    thumbnails.generate(self.post.image, variant).name,
+                )
+
+    def test_prefetch_is_one_lookup_per_page(self):
+        """Миниатюры страницы находятся одним запросом к kvstore."""
+        posts = [self.post] + [
+            Post.objects.create(
+                author=self.user,
+                text=f'Ещё картинка {num}',
+                image=SimpleUploadedFile(
+                    f'more{num}.gif', SMALL_GIF, 'image/gif'),
+            )
+            for num in range(3)
+        ]
+        self.generate_set(posts[0])
+        cache.clear()
+        posts = list(Post.objects.filter(pk__in=[p.pk for p in posts]))
+        with self.assertNumQueries(1):
+            thumbnails.prefetch(posts, 'feed')
+        with self.assertNumQueries(0):
+            found = [thumbnails._ready(post, 'feed-960-jpeg')
+                     for post in posts]
+            pictures = [thumbnails.picture(post, 'feed') for post in posts]
+        self.assertEqual(sum(image is not None for image in found), 1)
+        self.assertEqual(
+            [bool(picture['srcsets']['webp']) for picture in pictures],
+            [post.pk == self.post.pk for post in posts])
+
+    def test_variants_are_resized_and_reencoded(self):
+        """Каждая ширина набора есть в WebP и JPEG с пропорциями 960x339."""
+        for (width, fmt), image in self.generate_set(self.post).items():
+            with self.subTest(width=width, fmt=fmt):
+                self.assertEqual(image.width, width)
+                self.assertEqual(image.height, round(339 * width / 960))
+                self.assertTrue(image.name.endswith(
+                    '.webp' if fmt == 'webp' else '.jpg'))
+
+    def test_feed_emits_srcset(self):
+        """Лента отдаёт <picture> со srcset по ширинам и ленивой загрузкой."""
+        images = self.generate_set(self.post)
+        response = Client().get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        for (width, fmt), image in images.items():
+            self.assertContains(response, f'{image.url} {width}w')
+        self.assertContains(response, f'src="{images[960, "jpeg"].url}"')
+
+    def test_detail_image_is_not_lazy(self):
+        """Картинка на странице поста грузится сразу."""
+        response = Client().get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        self.assertContains(response, 'srcset', count=0)
+        self.assertContains(response, self.post.image.url)
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_detail_reads_variants_at_once(self):
+        """Страница поста ищет все варианты одним запросом к kvstore."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        with CaptureQueriesContext(connection) as queries:
+            Client().get(url)
+        kvstore = [query for query in queries.captured_queries
+                   if 'thumbnail_kvstore' in query['sql']]
+        self.assertEqual(len(kvstore), 1)
@@ -0,0 +1,118 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Старый пост автора')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def feed_posts(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_feed(self):
+        """Подписка добавляет в ленту уже написанные посты."""
+        self.client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}))
+        self.assertEqual(self.feed_posts(), [self.old_post])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists())
+        self.assertEqual(self.feed_posts(), [post, self.old_post])
+
+    def test_unfollow_trims_feed(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    def test_feed_is_capped(self):
+        """Лента хранит не больше FEED_MAX_ENTRIES записей."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        with mock.patch.object(timeline, 'FEED_MAX_ENTRIES', 2):
+            for num in range(3):
+                Post.objects.create(author=self.author, text=f'Пост {num}')
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 2)
+
+    def test_fan_out_trims_feeds_in_one_query(self):
+        """Обрезка лент при раскладке не зависит от числа подписчиков."""
+        def post_queries(followers):
+            for num in range(followers):
+                fan = User.objects.create_user(
+                    username=f'Fan{followers}-{num}')
+                Follow.objects.create(user=fan, author=self.author)
+            with CaptureQueriesContext(connection) as queries:
+                Post.objects.create(author=self.author, text='Пост')
+            return len(queries)
+
+        self.assertEqual(post_queries(1), post_queries(5))
+
+    def test_feed_cursor_pages(self):
+        """Курсорные страницы ленты идут без пропусков и повторов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [self.old_post] + [
+            Post.objects.create(author=self.author, text=f'Пост {num}')
+            for num in range(11)]
+        first = self.client.get(
+            reverse('posts:follow_index') + '?after=').context['page_obj']
+        second = self.client.get(
+            reverse('posts:follow_index') + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(first) + list(second), posts[::-1])
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярных авторов читаются запросом по подпискам."""
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            Follow.objects.create(user=self.reader, author=self.author)
+            post = Post.objects.create(author=self.author, text='Хит')
+            self.assertFalse(
+                FeedEntry.objects.filter(user=self.reader).exists())
+            self.assertEqual(self.feed_posts(), [post, self.old_post])
+
+    def test_rebuild_all_matches_fan_out(self):
+        """Пересборка лент даёт те же записи с тем же ограничением."""
+        other = User.objects.create_user(username='Popular')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        Post.objects.create(author=self.author, text='Ещё пост')
+        Post.objects.create(author=other, text='Пост популярного')
+        FeedEntry.objects.all().delete()
+        with mock.patch.object(timeline, 'FEED_MAX_ENTRIES', 2):
+            timeline.rebuild_all()
+        latest = list(
+            Post.objects.order_by('-pub_date', '-id')[:2]
+            .values_list('pk', flat=True))
+        self.assertEqual(list(
+            FeedEntry.objects.filter(user=self.reader)
+            .values_list('post', flat=True)), latest)
+        with mock.patch.object(timeline, 'FANOUT_FOLLOWERS_LIMIT', 0):
+            timeline.rebuild_all()
+        self.assertFalse(FeedEntry.objects.exists())
@@ -1,15 +1,23 @@
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django import forms
 
+import base64
 import tempfile
+import warnings
 import shutil
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
-from posts.pagination import POSTS_PER_PAGE
+from posts.caching import (INDEX_FEED, bump_generation, slug_feed,
+                           username_feed)
+from posts.pagination import (COMMENTS_PER_PAGE, POSTS_PER_PAGE,
+                              decode_cursor)
 from ..models import Comment, Follow, Group, Post
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -55,6 +63,7 @@ class PostViewsTests(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.guest_client = Client()
@@ -132,7 +141,7 @@ class PostViewsTests(TestCase):
         self.assertIsInstance(comment, Comment)
         self.assertEqual(comment.author, self.user)
         self.assertEqual(comment.post, self.post)
-        self.assertEqual(response.context['comments'].count(), 1)
+        self.assertEqual(len(response.context['comments']), 1)
 
     def test_post_create_show_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
@@ -195,14 +204,70 @@ class PostViewsTests(TestCase):
             group=self.group
         )
         response = self.authorized_client.get(reverse('posts:index')).content
+        Post.objects.filter(pk=post.pk).update(text='Changed quietly')
+        response_cached = self.authorized_client.get(
+            reverse('posts:index')).content
+        self.assertEqual(response, response_cached)
         post.delete()
         response_post_delete = self.authorized_client.get(
             reverse('posts:index')).content
-        self.assertEqual(response, response_post_delete)
+        self.assertNotEqual(response, response_post_delete)
+        self.assertNotContains(
+            self.authorized_client.get(reverse('posts:index')), 'Test text')
+
+    def test_feed_cache_is_page_aware(self):
+        """Фрагменты лент кэшируются отдельно для каждой страницы."""
+        Post.objects.bulk_create(
+            Post(text=f'Bulk post {num}', author=self.user)
+            for num in range(POSTS_PER_PAGE)
+        )
         cache.clear()
-        response_clear_cache = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(response, response_clear_cache)
+        first = self.authorized_client.get(reverse('posts:index'))
+        second = self.authorized_client.get(reverse('posts:index') + '?page=2')
+        self.assertNotEqual(first.content, second.content)
+        self.assertContains(second, self.post.text)
+
+    def test_feed_cache_invalidated_by_edit(self):
+        """Изменение поста сбрасывает кэш группы и профиля."""
+        pages = (
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Edited text for cache'
+        post.save()
+        for page in pages:
+            with self.subTest(page=page):
+                self.assertContains(
+                    self.authorized_client.get(page), 'Edited text for cache')
+
+    def test_feed_queries_do_not_grow_with_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице."""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+        )
+        author = User.objects.create_user(username='Another')
+        for page in pages:
+            with self.subTest(page=page):
+                cache.clear()
+                self.authorized_client.get(page)
+                cache.clear()
+                with CaptureQueriesContext(connection) as few:
+                    self.authorized_client.get(page)
+                Post.objects.bulk_create(
+                    Post(text='More', author=self.user, group=self.group)
+                    for _ in range(3)
+                )
+                Post.objects.update(author=author)
+                Post.objects.filter(pk=self.post.pk).update(author=self.user)
+                cache.clear()
+                with CaptureQueriesContext(connection) as many:
+                    self.authorized_client.get(page)
+                self.assertEqual(len(few), len(many))
 
     def test_authorized_follow(self):
         """Авторизованный пользователь может
@@ -324,3 +389,352 @@ class PostViewsPaginatorTests(TestCase):
                     len(response2.context['page_obj']),
                     second_page_posts_count
                 )
+
+    def test_cursor_paginator(self):
+        """Курсорный режим листает ленты без пропусков и повторов."""
+        pages_for_test = [self.index, self.profile, self.group_list]
+        expected = list(Post.objects.order_by('-pub_date', '-id'))
+        for page in pages_for_test:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page + '?after=')
+                first_page = response.context['page_obj']
+                self.assertEqual(len(first_page), self.paginator_length)
+                self.assertFalse(first_page.has_previous())
+                response2 = self.authorized_client.get(
+                    page + f'?after={first_page.next_cursor}')
+                second_page = response2.context['page_obj']
+                self.assertEqual(
+                    list(first_page) + list(second_page), expected)
+                self.assertFalse(second_page.has_next())
+                response3 = self.authorized_client.get(
+                    page + f'?before={second_page.previous_cursor}')
+                self.assertEqual(
+                    list(response3.context['page_obj']), list(first_page))
+
+    def test_cursor_paginator_bad_token(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.authorized_client.get(self.index + '?after=%%%')
+        self.assertEqual(
+            len(response.context['page_obj']), self.paginator_length)
+
+    def test_cursor_out_of_integer_range(self):
+        """Курсор с id вне диапазона базы считается испорченным."""
+        post = Post.objects.first()
+        raw = f'{post.pub_date.isoformat()}|{10 ** 23}'
+        token = base64.urlsafe_b64encode(raw.encode()).decode()
+        self.assertIsNone(decode_cursor(token, Post))
+        detail = reverse('posts:post_detail', args=(post.pk,))
+        for url in (self.index, detail, reverse('api:post_list')):
+            for param in ('after', 'before'):
+                with self.subTest(url=url, param=param):
+                    response = self.authorized_client.get(
+                        url, {param: token})
+                    self.assertEqual(response.status_code, 200)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Conditional')
+        cls.group = Group.objects.create(
+            title='Условная группа',
+            slug='conditional',
+            description='Описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Пост для условных запросов',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Неизменённая лента отвечает 304 без запросов к базе."""
+        url = reverse('posts:index')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_feeds_are_revalidated_after_changes(self):
+        """ETag лент меняется после правки поста, группы и подписки."""
+        follower = User.objects.create_user(username='Follower')
+        urls_and_changes = (
+            (reverse('posts:group_list', args=(self.group.slug,)),
+             lambda: self.group.save()),
+            (reverse('posts:profile', args=(self.author.username,)),
+             lambda: Follow.objects.create(user=follower, author=self.author)),
+        )
+        for url, change in urls_and_changes:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 304)
+                change()
+                self.assertEqual(
+                    self.revalidate(url, response).status_code, 200)
+
+    def test_post_detail_validators(self):
+        """Страница поста сверяется только по ETag и сбрасывается
+        комментарием."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_sessions_get_different_etags(self):
+        """Гость и вошедший пользователь получают разные ETag."""
+        url = reverse('posts:index')
+        guest = self.client.get(url)
+        self.client.force_login(self.author)
+        self.assertEqual(self.revalidate(url, guest).status_code, 200)
+
+    def test_csrf_cookie_changes_etag(self):
+        """Новый токен CSRF не даёт взять из кэша форму со старым."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        response = self.client.get(url)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'rotated'
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    def test_missing_objects_are_not_found(self):
+        """Для несуществующих объектов по-прежнему 404."""
+        urls = (
+            reverse('posts:group_list', args=('missing',)),
+            reverse('posts:profile', args=('missing',)),
+            reverse('posts:post_detail', args=(self.post.pk + 100,)),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Cached')
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост из кэша страниц')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, url, **extra):
+        return self.guest_client.get(url, **extra)
+
+    def test_anonymous_page_is_served_from_cache(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов."""
+        url = reverse('posts:index')
+        self.assertNotIn('X-Page-Cache', self.get(url))
+        with self.assertNumQueries(0):
+            response = self.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, self.post.text)
+
+    def test_key_uses_only_page_params(self):
+        """Ключ зависит от параметров страницы, а не от прочих."""
+        url = reverse('posts:index')
+        self.get(url)
+        self.assertIn('X-Page-Cache', self.get(url + '?utm_source=mail'))
+        self.assertNotIn('X-Page-Cache', self.get(url + '?page=2'))
+
+    def test_cookies_bypass_cache(self):
+        """С кукой сессии, CSRF или сообщений страница рендерится заново."""
+        url = reverse('posts:index')
+        self.get(url)
+        for cookie in (settings.SESSION_COOKIE_NAME,
+                       settings.CSRF_COOKIE_NAME, 'messages'):
+            with self.subTest(cookie=cookie):
+                client = Client()
+                client.cookies[cookie] = 'value'
+                self.assertNotIn('X-Page-Cache', client.get(url))
+
+    def test_changes_purge_pages(self):
+        """Новый пост и комментарий сбрасывают закэшированные страницы."""
+        index = reverse('posts:index')
+        detail = reverse('posts:post_detail', args=(self.post.pk,))
+        self.get(index)
+        self.get(detail)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        response = self.get(index)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Свежий пост')
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Свежий комментарий')
+        self.assertContains(self.get(detail), 'Свежий комментарий')
+
+    def test_unrelated_changes_keep_pages(self):
+        """Пост другого автора не сбрасывает страницу профиля."""
+        profile = reverse('posts:profile', args=(self.author.username,))
+        self.get(profile)
+        Post.objects.create(
+            author=User.objects.create_user(username='Other'), text='Чужой')
+        self.assertEqual(self.get(profile)['X-Page-Cache'], 'hit')
+        self.assertNotIn('X-Page-Cache', self.get(reverse('posts:index')))
+
+    def test_commenter_rename_drops_post_page(self):
+        """Переименование комментатора сбрасывает страницу чужого поста."""
+        commenter = User.objects.create_user(username='Commenter')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий')
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        etag = self.get(url)['ETag']
+        commenter.username = 'Renamed'
+        commenter.save()
+        response = self.get(url)
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Renamed')
+        self.assertEqual(
+            self.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_name_feeds_are_valid_cache_keys(self):
+        """Юникод и пробелы в имени и slug не попадают в ключи кэша."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            bump_generation(
+                username_feed('Пользователь'), slug_feed('слаг с пробелом'))
+
+    def test_reassigned_name_drops_pages(self):
+        """Имя или slug, занятые заново, не отдают чужую страницу."""
+        user = User.objects.create_user(username='Reused')
+        group = Group.objects.create(title='Старая', slug='reused')
+        urls = (reverse('posts:profile', args=('Reused',)),
+                reverse('posts:group_list', args=('reused',)))
+        for url in urls:
+            self.get(url)
+        user.delete()
+        group.delete()
+        User.objects.create_user(username='Reused')
+        Group.objects.create(title='Новая', slug='reused')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotIn('X-Page-Cache', self.get(url))
+
+    def test_cached_page_answers_conditional_get(self):
+        """Страница из кэша отвечает 304 на совпавший ETag."""
+        url = reverse('posts:index')
+        response = self.get(url)
+        with self.assertNumQueries(0):
+            revalidated = self.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Carded')
+        cls.post = Post.objects.create(author=cls.author, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_card_is_reused_across_feeds(self):
+        """Карточка рендерится один раз и берётся из кэша в других лентах."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        bump_generation(INDEX_FEED)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Карточка')
+        self.assertNotContains(response, 'Тихая правка')
+
+    def test_edit_renders_card_again(self):
+        """Правка поста меняет версию карточки."""
+        self.client.get(reverse('posts:index'))
+        self.post.text = 'Исправленная карточка'
+        self.post.save()
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Исправленная карточка')
+
+    def test_author_rename_renders_card_again(self):
+        """Новое имя автора попадает в карточки без ожидания таймаута."""
+        self.client.get(reverse('posts:index'))
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Новое Имя')
+
+    def test_flags_are_part_of_key(self):
+        """Карточки с разными флагами кэшируются отдельно."""
+        author_link = 'Автор: <a href="{}">'.format(
+            reverse('posts:profile', args=(self.author.username,)))
+        response = self.client.get(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertNotContains(response, author_link)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, author_link)
+
+
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Talkative')
+        cls.post = Post.objects.create(author=cls.author, text='Обсуждение')
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f'Реплика {num}')
+            for num in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    def test_detail_shows_first_page(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, 'Показать ещё')
+
+    def test_load_more_fragment(self):
+        """Фрагмент «Показать ещё» отдаёт оставшиеся комментарии."""
+        first = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,)))
+        cursor = first.context['comments'].next_cursor
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.pk,)),
+            {'after': cursor},
+        )
+        self.assertTemplateUsed(response, 'includes/comments.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertFalse(comments.has_next())
+        shown = set(first.context['comments']) | set(comments)
+        self.assertEqual(len(shown), COMMENTS_PER_PAGE + 5)
+
+    def test_detail_cost_does_not_grow_with_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.client.get(url)
+        cache.clear()
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text='Ещё')
+            for _ in range(50)
+        )
+        cache.clear()
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(after), len(before))
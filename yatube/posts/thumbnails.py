@@ -0,0 +1,220 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedDBKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .caching import bump_generation, post_feeds
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_WORKERS = 2
+
+IMAGE_SETS = {
+    'feed': ('960x339', {'padding': True, 'upscale': True}),
+    'detail': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+WIDTHS = (320, 640, 960)
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+FALLBACK_FORMAT = 'jpeg'
+
+
+def variant_name(image_set, width, fmt):
+    return f'{image_set}-{width}-{fmt}'
+
+
+def _build_variants():
+    """Варианты всех наборов: каждая ширина в каждом формате.
+
+    Пропорции берутся из геометрии набора, поэтому узкие варианты
+    выглядят так же, как полноразмерная миниатюра.
+    """
+    variants = {}
+    for image_set, (geometry, options) in IMAGE_SETS.items():
+        full_width, full_height = map(int, geometry.split('x'))
+        for width in WIDTHS:
+            height = round(full_height * width / full_width)
+            for fmt, pil_format in FORMATS.items():
+                variants[variant_name(image_set, width, fmt)] = (
+                    f'{width}x{height}', dict(options, format=pil_format))
+    return variants
+
+
+VARIANTS = _build_variants()
+
+_executor = ThreadPoolExecutor(
+    max_workers=THUMBNAIL_WORKERS, thread_name_prefix='thumbnails')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def thumbnail_file(image, variant):
+    """Файл миниатюры варианта без обращения к хранилищу и картинке.
+
+    Имя вычисляется так же, как в ThumbnailBackend.get_thumbnail.
+    """
+    geometry, options = VARIANTS[variant]
+    backend = default.backend
+    source = ImageFile(image)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def lookup(image, variant):
+    """Готовая миниатюра из kvstore или None; картинку не открывает."""
+    return default.kvstore.get(thumbnail_file(image, variant))
+
+
+def _bulk_get_raw(keys):
+    """Значения kvstore по ключам: один запрос в кэш и один в базу."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDBKVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        for key in missing:
+            found[key] = stored.get(key, EMPTY_VALUE)
+        kvstore.cache.set_many(
+            {key: found[key] for key in missing},
+            sorl_settings.THUMBNAIL_CACHE_TIMEOUT,
+        )
+    return {
+        key: None if value == EMPTY_VALUE else value
+        for key, value in found.items()
+    }
+
+
+def set_variants(image_set):
+    """Имена вариантов набора: (ширина, формат, имя)."""
+    return [
+        (width, fmt, variant_name(image_set, width, fmt))
+        for width in WIDTHS for fmt in FORMATS
+    ]
+
+
+def prefetch(posts, image_set):
+    """Находит готовые миниатюры набора для всех постов страницы разом.
+
+    Результат запоминается в посте и читается picture и ready_count,
+    поэтому число обращений к kvstore не зависит от размера страницы.
+    """
+    variants = [name for _, _, name in set_variants(image_set)]
+    files = {
+        (post, variant): add_prefix(thumbnail_file(post.image, variant).key)
+        for post in posts if post.image
+        for variant in variants
+    }
+    values = _bulk_get_raw(list(files.values()))
+    for (post, variant), key in files.items():
+        value = values.get(key)
+        post.__dict__.setdefault('_thumbnails', {})[variant] = (
+            deserialize_image_file(value) if value else None)
+
+
+def generate(image, variant):
+    geometry, options = VARIANTS[variant]
+    return get_thumbnail(image, geometry, **options)
+
+
+def _run(image_name, variant, feeds):
+    try:
+        generate(image_name, variant)
+        bump_generation(*feeds)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', image_name)
+    finally:
+        connections.close_all()
+        with _pending_lock:
+            _pending.discard((image_name, variant))
+
+
+def _submit(image_name, variant, feeds):
+    with _pending_lock:
+        if (image_name, variant) in _pending:
+            return
+        _pending.add((image_name, variant))
+    _executor.submit(_run, image_name, variant, feeds)
+
+
+def schedule(post, variants=VARIANTS):
+    """Ставит генерацию миниатюр в фоновый пул после фиксации транзакции.
+
+    Когда миниатюра готова, ленты с постом сбрасываются из кэша, чтобы
+    вместо оригинала в них попала миниатюра.
+    """
+    if not post.image:
+        return
+    feeds = post_feeds(post)
+    for variant in variants:
+        transaction.on_commit(
+            lambda variant=variant: _submit(post.image.name, variant, feeds))
+
+
+def _ready(post, variant):
+    prefetched = getattr(post, '_thumbnails', {})
+    if variant in prefetched:
+        return prefetched[variant]
+    return lookup(post.image, variant)
+
+
+def ready_count(post, image_set):
+    """Сколько вариантов набора уже готово; для ключей кэша карточек."""
+    if not post.image:
+        return 0
+    return sum(
+        _ready(post, variant) is not None
+        for _, _, variant in set_variants(image_set)
+    )
+
+
+def picture(post, image_set):
+    """Данные для <picture>: srcset по форматам и запасной src.
+
+    В srcset попадают только готовые варианты, недостающие ставятся
+    в очередь. Пока готового JPEG нет, запасным src служит оригинал.
+    """
+    if not post.image:
+        return None
+    srcsets = {fmt: [] for fmt in FORMATS}
+    missing = []
+    for width, fmt, variant in set_variants(image_set):
+        thumbnail = _ready(post, variant)
+        if thumbnail is None:
+            missing.append(variant)
+        else:
+            srcsets[fmt].append((thumbnail, width))
+    if missing:
+        schedule(post, missing)
+    fallback = srcsets[FALLBACK_FORMAT]
+    return {
+        'srcsets': {
+            fmt: ', '.join(f'{image.url} {width}w' for image, width in items)
+            for fmt, items in srcsets.items()
+        },
+        'src': fallback[-1][0].url if fallback else post.image.url,
+    }
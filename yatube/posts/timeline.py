@@ -0,0 +1,168 @@
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Post, UserCounters
+from .pagination import get_page
+
+FEED_MAX_ENTRIES = 1000
+
+FANOUT_FOLLOWERS_LIMIT = 1000
+
+POPULAR_AUTHORS_KEY = 'timeline:popular-authors'
+
+POPULAR_AUTHORS_TIMEOUT = 60 * 5
+
+ENTRY_ORDERING = ('pub_date', 'post')
+
+
+def popular_authors():
+    """Авторы, чьи посты не раскладываются по лентам подписчиков."""
+    authors = cache.get(POPULAR_AUTHORS_KEY)
+    if authors is None:
+        authors = set(
+            UserCounters.objects
+            .filter(followers_count__gt=FANOUT_FOLLOWERS_LIMIT)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(POPULAR_AUTHORS_KEY, authors, POPULAR_AUTHORS_TIMEOUT)
+    return authors
+
+
+def _trim(where, params):
+    """Удаляет записи сверх FEED_MAX_ENTRIES свежих в выбранных лентах."""
+    entries = FeedEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''DELETE FROM {entries} WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY user_id
+                        ORDER BY pub_date DESC, post_id DESC
+                    ) AS position
+                    FROM {entries}
+                    WHERE {where}
+                ) ranked
+                WHERE position > %s
+            )''',
+            [*params, FEED_MAX_ENTRIES],
+        )
+
+
+def trim_feed(user_id):
+    """Оставляет в ленте не больше FEED_MAX_ENTRIES свежих записей."""
+    _trim('user_id = %s', [user_id])
+
+
+def trim_followers_feeds(author_id):
+    """Обрезает ленты всех подписчиков автора одним запросом."""
+    _trim(
+        f'user_id IN (SELECT user_id FROM {Follow._meta.db_table} '
+        f'WHERE author_id = %s)',
+        [author_id],
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    followers = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:FANOUT_FOLLOWERS_LIMIT + 1]
+    )
+    if len(followers) > FANOUT_FOLLOWERS_LIMIT:
+        if post.author_id not in popular_authors():
+            cache.delete(POPULAR_AUTHORS_KEY)
+        return
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, author_id=post.author_id,
+                   pub_date=post.pub_date)
+         for user_id in followers),
+        ignore_conflicts=True,
+    )
+    trim_followers_feeds(post.author_id)
+
+
+def backfill(user, author):
+    """Добавляет в ленту последние посты автора после подписки."""
+    followers = (
+        UserCounters.objects.filter(user=author)
+        .values_list('followers_count', flat=True).first()
+    )
+    if followers and followers > FANOUT_FOLLOWERS_LIMIT:
+        return
+    posts = (
+        Post.objects.filter(author=author)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:FEED_MAX_ENTRIES]
+    )
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user=user, post_id=post_id, author=author,
+                   pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True,
+    )
+    trim_feed(user.pk)
+
+
+def rebuild_all():
+    """Пересобирает все ленты одним запросом вместо backfill на подписку.
+
+    Результат тот же: по FEED_MAX_ENTRIES свежих постов на читателя
+    без постов популярных авторов.
+    """
+    FeedEntry.objects.all().delete()
+    entries, posts, follows, counters = (
+        model._meta.db_table
+        for model in (FeedEntry, Post, Follow, UserCounters)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''INSERT INTO {entries} (user_id, post_id, author_id, pub_date)
+            SELECT user_id, post_id, author_id, pub_date FROM (
+                SELECT follow.user_id, post.id AS post_id, post.author_id,
+                       post.pub_date,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY follow.user_id
+                           ORDER BY post.pub_date DESC, post.id DESC
+                       ) AS position
+                FROM {follows} follow
+                JOIN {posts} post ON post.author_id = follow.author_id
+                WHERE follow.author_id NOT IN (
+                    SELECT user_id FROM {counters} WHERE followers_count > %s)
+            ) ranked
+            WHERE position <= %s''',
+            [FANOUT_FOLLOWERS_LIMIT, FEED_MAX_ENTRIES],
+        )
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed_page(request, user):
+    """Страница ленты подписок в формате page_obj с постами.
+
+    Посты популярных авторов в ленту не раскладываются и дочитываются
+    запросом по подпискам.
+    """
+    popular = popular_authors()
+    pulled = popular and list(
+        Follow.objects.filter(user=user, author__in=popular)
+        .values_list('author', flat=True)
+    )
+    if pulled:
+        entries = FeedEntry.objects.filter(user=user).values('post')
+        return get_page(
+            request,
+            Post.objects.for_feed().filter(
+                Q(pk__in=entries) | Q(author__in=pulled)),
+        )
+    page_obj = get_page(
+        request,
+        FeedEntry.objects.filter(user=user)
+        .select_related('post__author', 'post__group'),
+        ordering=ENTRY_ORDERING,
+    )
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
+    return page_obj
@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+
+MAX_PIXELS = 40_000_000
+
+MASTER_SIZE = (2048, 2048)
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+JPEG_QUALITY = 85
+
+
+def _open(upload):
+    """Открывает картинку, читая только заголовок, и проверяет лимиты."""
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': MAX_UPLOAD_BYTES // (1024 * 1024)},
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image')
+    if image.format not in ALLOWED_FORMATS:
+        raise ValidationError(
+            'Поддерживаются только JPEG, PNG, GIF и WebP.',
+            code='invalid_format',
+        )
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)d мегапикселей.',
+            code='too_many_pixels',
+            params={'limit': MAX_PIXELS // 1_000_000},
+        )
+    return image
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к мастер-копии.
+
+    Поворачивает по EXIF, уменьшает до MASTER_SIZE и пересохраняет
+    без метаданных: JPEG, а при прозрачности PNG. Результат крупнее
+    FILE_UPLOAD_MAX_MEMORY_SIZE уходит во временный файл на диске.
+    """
+    image = _open(upload)
+    buffer = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    # Пиксели читаются только здесь: битый или обрезанный файл
+    # обнаруживается при декодировании, а не в _open.
+    try:
+        # JPEG декодируется сразу в уменьшенном масштабе.
+        image.draft('RGB', MASTER_SIZE)
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image, fmt, ext = image.convert('RGBA'), 'PNG', '.png'
+            options = {'optimize': True}
+        else:
+            image, fmt, ext = image.convert('RGB'), 'JPEG', '.jpg'
+            options = {'quality': JPEG_QUALITY, 'optimize': True}
+        image.thumbnail(MASTER_SIZE, Image.LANCZOS)
+        image.save(buffer, fmt, **options)
+    except (OSError, Image.DecompressionBombError):
+        buffer.close()
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image')
+    name = os.path.splitext(os.path.basename(upload.name))[0] + ext
+    size = buffer.tell()
+    buffer.seek(0)
+    return UploadedFile(buffer, name, Image.MIME[fmt], size)
@@ -1,14 +1,30 @@
 from django.urls import include, path
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('rss/', feeds.cached_feed(
+        feeds.LatestPostsFeed, feeds.index_feeds), name='index_rss'),
+    path('atom/', feeds.cached_feed(
+        feeds.LatestPostsAtomFeed, feeds.index_feeds), name='index_atom'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', feeds.cached_feed(
+        feeds.GroupPostsFeed, feeds.group_feeds), name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.cached_feed(
+        feeds.GroupPostsAtomFeed, feeds.group_feeds), name='group_atom'),
     path('auth/', include('django.contrib.auth.urls')),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/rss/', feeds.cached_feed(
+        feeds.AuthorPostsFeed, feeds.author_feeds), name='profile_rss'),
+    path('profile/<str:username>/atom/', feeds.cached_feed(
+        feeds.AuthorPostsAtomFeed, feeds.author_feeds),
+        name='profile_atom'),
+    path('search/', views.search, name='search'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
@@ -1,37 +1,54 @@
+from urllib.parse import urlencode
+
+from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import condition
 from .models import Follow, Post, Group, User
-from .pagination import get_page
+from .pagination import (COMMENT_ORDERING, COMMENTS_PER_PAGE,
+                         POSTS_PER_PAGE, get_cursor_page, get_page)
+from . import conditional, thumbnails, timeline
+from .search import search_posts
+from .caching import (INDEX_FEED, feed_cache, follow_feed, group_feed,
+                      profile_feed)
 from django.contrib.auth.decorators import login_required
+from core.budgets import query_budget
 from django.shortcuts import redirect
 from . forms import PostForm, CommentForm
 
 
+@query_budget(queries=5)
+@condition(etag_func=conditional.index_etag)
 def index(request):
     template = 'posts/index.html'
-    page_obj = get_page(request,
-                        Post.objects.select_related('author', 'group')
-                        )
+    page_obj = get_page(request, Post.objects.for_feed())
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_cache': feed_cache(request, INDEX_FEED),
     }
     return render(request, template, context)
 
 
+@query_budget(queries=7)
+@condition(etag_func=conditional.group_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_page(request, group.posts.all())
+    page_obj = get_page(request, group.posts.for_feed())
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'feed_cache': feed_cache(request, group_feed(group.pk)),
     }
     return render(request, template, context)
 
 
+@query_budget(queries=8)
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
-    page_obj = get_page(request, author.posts.all())
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username)
+    page_obj = get_page(request, author.posts.for_feed())
     following = request.user.is_authenticated and (
         request.user.follower.filter(author=author).exists()
     )
@@ -39,14 +56,35 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'feed_cache': feed_cache(request, profile_feed(author.pk)),
     }
     return render(request, template, context)
 
 
+@query_budget(queries=5)
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        paginator = Paginator(search_posts(query), POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': '&' + urlencode({'q': query}),
+    }
+    return render(request, template, context)
+
+
+@query_budget(queries=6)
+@condition(etag_func=conditional.post_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
+    comments = get_cursor_page(
+        request, post.comments.for_detail(), COMMENT_ORDERING,
+        per_page=COMMENTS_PER_PAGE)
     form = CommentForm(request.POST or None)
     context = {
         'post': post,
@@ -56,6 +94,18 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+@query_budget(queries=3)
+@condition(etag_func=conditional.post_etag)
+def post_comments(request, post_id):
+    template = 'includes/comments.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_cursor_page(
+        request, post.comments.for_detail(), COMMENT_ORDERING,
+        per_page=COMMENTS_PER_PAGE)
+    return render(request, template, {'post': post, 'comments': comments})
+
+
+@query_budget(queries=3)
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -64,14 +114,16 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', username=post.author)
     return render(request, 'posts/post_create.html', {'form': form})
 
 
+@query_budget(queries=4)
 @login_required
 def post_edit(request, post_id):
     template = 'posts/post_create.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.for_detail(), pk=post_id)
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     form = PostForm(request.POST or None,
@@ -80,11 +132,14 @@ def post_edit(request, post_id):
                     )
     if form.is_valid():
         form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     return render(request, template, {
         'form': form, 'is_edit': True, 'post': post})
 
 
+@query_budget(queries=6)
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
@@ -97,17 +152,20 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(queries=6)
 @login_required
 def follow_index(request):
     template = 'includes/follow.html'
-    following_posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_page(request, following_posts)
+    page_obj = timeline.get_feed_page(request, request.user)
     context = {
         'page_obj': page_obj,
+        'feed_cache': feed_cache(
+            request, INDEX_FEED, follow_feed(request.user.pk)),
     }
     return render(request, template, context)
 
 
+@query_budget(queries=4)
 @login_required
 def profile_follow(request, username):
     follow_author = get_object_or_404(User, username=username)
@@ -116,6 +174,7 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(queries=8)
 @login_required
 def profile_unfollow(request, username):
     unfollow_author = get_object_or_404(User, username=username)
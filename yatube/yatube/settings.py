@@ -22,6 +22,11 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media') 
 
+# Uploads are always streamed to a temporary file in chunks, never to memory.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -49,6 +54,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'django.contrib.admin',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -59,11 +65,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -72,7 +82,10 @@ ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The alias would default to the module name ("backends"); keep
+        # the stock one so engines['django'] still resolves.
+        'NAME': 'django',
+        'BACKEND': 'core.backends.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -109,9 +122,53 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Read replicas: comma-separated paths of SQLite copies refreshed by
+# `manage.py sync_replica`. core.routers sends reads there, and
+# core.middleware pins a user (by id, across devices) to the primary for
+# REPLICA_PIN_SECONDS after a write, which should exceed the sync interval.
+# While replicas are configured, feed invalidations are journaled in the
+# cache so each sync can refresh just the feeds changed since the last one.
+DATABASE_REPLICAS = []
+
+for path in filter(None, os.environ.get('YATUBE_REPLICAS', '').split(',')):
+    alias = f'replica{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[alias] = dict(
+        DATABASES['default'], NAME=path, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = 60
+
+# cProfile for staff requests with ?_profile and for a sampled share of
+# all requests; profiles are kept in a ring buffer and listed at /profiles/.
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+
+PROFILING_SAMPLE_RATE = 0.0
+
+PROFILING_MAX_FILES = 100
+
+# Prometheus metrics at /metrics. Every worker keeps its own counters and
+# writes them to METRICS_DIR at most once per METRICS_FLUSH_SECONDS; the
+# endpoint sums the files of all workers. Without a directory only the
+# serving process is reported. Files of exited workers are kept so that
+# counters never go down, so clear the directory on deploy.
+METRICS_DIR = os.environ.get('YATUBE_METRICS_DIR') or None
+
+METRICS_FLUSH_SECONDS = 1.0
+
+# Besides staff users; behind a proxy REMOTE_ADDR is the proxy's address.
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Per-connection pragmas applied by core.sqlite on top of its defaults
+# (WAL, synchronous=NORMAL, busy_timeout, cache and mmap sizes).
+# Set a pragma to None to skip it.
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -153,6 +210,6 @@ STATIC_URL = '/static/'
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.backends.LocMemCache',
     }
 }
@@ -25,6 +25,8 @@ urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('about/', include('about.urls', namespace='about')),
+    path('api/', include('api.urls', namespace='api')),
+    path('', include('core.urls', namespace='core')),
 ]
 
 handler404 = 'core.views.page_not_found'